@@ -1,4 +1,10 @@
-from app import app  # Importa a instância do app do __init__.py
+import os
+from app import bootstrap_app_indexes, create_app
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Servidor de desenvolvimento; em produção use: gunicorn -c gunicorn.conf.py 'app:create_app()'
+    if not bootstrap_app_indexes(app):
+        raise SystemExit("Índices obrigatórios ausentes (MONGO_INDEXES_STRICT ativo)")
+    app.run(debug=os.getenv('FLASK_DEBUG', 'false').lower() == 'true')
@@ -1,59 +1,214 @@
 from flask import Flask, jsonify
 from flask_jwt_extended import JWTManager
-from pymongo import MongoClient
 from dotenv import load_dotenv
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
+import click
 import os
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-# Criar a instância do app
-app = Flask(__name__)
-
-# Configurar CORS para permitir acesso apenas de localhost:3000
-CORS(app, resources={r"/*": {
-    "origins": "*",
-    "allow_headers": ["Content-Type", "Authorization"],  # Permitir cabeçalhos como Content-Type e Authorization
-    "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Permitir os métodos HTTP necessários
-    "supports_credentials": True  # Permitir o uso de cookies/credenciais se necessário
-}})
-
-# Configurar JWT
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
-jwt = JWTManager(app)
-
-# Conectar ao MongoDB
-mongo_uri = os.getenv('MONGO_URI')
-client = MongoClient(mongo_uri)
-
-# Testar a conexão com o MongoDB
-try:
-    client.admin.command('ping')
-    print("Conexão com o MongoDB bem-sucedida!")
-except Exception as e:
-    print(f"Erro ao conectar ao MongoDB: {e}")
-    exit(1)
-
-# Acessar o banco de dados
-db = client['barberapp']  # Especificando explicitamente o banco de dados
-app.db = db  # Tornar o db acessível em todo o app
-
-# Endpoint para verificar se o servidor está ativo
-@app.route('/isServerAlive', methods=['GET'])
-def is_server_alive():
-    # Se o servidor estiver vivo, retorna um status 200 OK
-    return jsonify({"status": "Server is alive!"}), 200
-
-# Importar as rotas e registrar
-from app.user_routes import bp as user_routes_bp
-from app.service_routes import bp as service_routes_bp
-from app.appointment_routes import bp as appointment_routes_bp
-
-# Registrar rotas
-app.register_blueprint(user_routes_bp)
-app.register_blueprint(service_routes_bp)
-app.register_blueprint(appointment_routes_bp)
-
-if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)  # Escuta em todas as interfaces de rede
+# Extensões criadas uma única vez e ligadas a cada app em create_app()
+jwt = JWTManager()
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() == 'true'
+
+
+def config_from_env():
+    """Configuração padrão lida das variáveis de ambiente."""
+    return {
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY'),
+        'MONGO_URI': os.getenv('MONGO_URI'),
+        'MONGO_DB_NAME': os.getenv('MONGO_DB_NAME', 'barberapp'),
+        # Pool de conexões configurável por variáveis de ambiente (por processo)
+        'MONGO_MAX_POOL_SIZE': int(os.getenv('MONGO_MAX_POOL_SIZE', '100')),
+        'MONGO_MIN_POOL_SIZE': int(os.getenv('MONGO_MIN_POOL_SIZE', '0')),
+        'MONGO_MAX_IDLE_TIME_MS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '60000')),
+        'MONGO_WAIT_QUEUE_TIMEOUT_MS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        'MONGO_CONNECT_TIMEOUT_MS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        'MONGO_SERVER_SELECTION_TIMEOUT_MS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        'MONGO_SOCKET_TIMEOUT_MS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '10000')),
+        'MONGO_CREATE_INDEXES': _env_bool('MONGO_CREATE_INDEXES', 'true'),
+        'MONGO_INDEXES_STRICT': _env_bool('MONGO_INDEXES_STRICT', 'false'),
+        # Leituras tolerantes a atraso (listagens) podem ir para secundários
+        'MONGO_LISTING_READ_PREFERENCE': os.getenv('MONGO_LISTING_READ_PREFERENCE', 'secondaryPreferred'),
+        'MONGO_MAX_STALENESS_SECONDS': int(os.getenv('MONGO_MAX_STALENESS_SECONDS', '90')),
+        # Proxies reversos na frente do Gunicorn: o IP do cliente vem do X-Forwarded-For
+        'TRUSTED_PROXY_HOPS': int(os.getenv('TRUSTED_PROXY_HOPS', '0')),
+    }
+
+
+def create_app(config=None):
+    """Cria o app sem acessar o banco; a conexão é aberta no primeiro uso.
+
+    `config` sobrescreve a configuração do ambiente. Testes podem passar
+    MONGO_DB (um banco pronto, ex.: mongomock) ou MONGO_CLIENT_FACTORY.
+    """
+    app = Flask(__name__)
+    app.config.update(config_from_env())
+    if config:
+        app.config.update(config)
+
+    # remote_addr passa a ser o cliente, e não o proxy (limite de login por IP)
+    hops = app.config['TRUSTED_PROXY_HOPS']
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
+    # Configurar CORS para permitir acesso apenas de localhost:3000
+    CORS(app, resources={r"/*": {
+        "origins": "*",
+        "allow_headers": ["Content-Type", "Authorization"],  # Permitir cabeçalhos como Content-Type e Authorization
+        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],  # Permitir os métodos HTTP necessários
+        "supports_credentials": True  # Permitir o uso de cookies/credenciais se necessário
+    }})
+
+    # Medir latência por endpoint, comandos do MongoDB e caches (exposto em /metrics)
+    from app.metrics import init_metrics
+    init_metrics(app)
+
+    # JSON com ObjectId/datetime/Decimal nativos e compressão das respostas grandes
+    from app.json_provider import init_json
+    from app.compression import init_compression
+    init_json(app)
+    init_compression(app)
+
+    # Configurar JWT
+    jwt.init_app(app)
+
+    # MongoDB: cliente criado sob demanda, um por processo
+    from app.database import init_db
+    init_db(app)
+
+    # Feed de mudanças dos agendamentos (SSE): também só conecta no primeiro uso
+    from app.changefeed import init_changefeed
+    init_changefeed(app)
+
+    # Fila de tarefas em segundo plano (pontos, agregados, lembretes)
+    from app.jobs import init_jobs
+    init_jobs(app)
+
+    # Endpoint para verificar se o servidor está ativo
+    @app.route('/isServerAlive', methods=['GET'])
+    def is_server_alive():
+        # Se o servidor estiver vivo, retorna um status 200 OK
+        return jsonify({"status": "Server is alive!"}), 200
+
+    # Importar as rotas e registrar
+    from app.user_routes import bp as user_routes_bp
+    from app.service_routes import bp as service_routes_bp
+    from app.appointment_routes import bp as appointment_routes_bp
+    from app.report_routes import bp as report_routes_bp
+
+    # Registrar rotas
+    app.register_blueprint(user_routes_bp)
+    app.register_blueprint(service_routes_bp)
+    app.register_blueprint(appointment_routes_bp)
+    app.register_blueprint(report_routes_bp)
+
+    register_commands(app)
+    return app
+
+
+def bootstrap_app_indexes(app):
+    """Cria/verifica os índices conforme MONGO_CREATE_INDEXES e MONGO_INDEXES_STRICT.
+
+    Roda fora do caminho de inicialização dos workers (comando `flask indexes`,
+    passo do deploy ou servidor de desenvolvimento). Retorna False se faltarem
+    índices com o modo estrito ativo.
+    """
+    from app.database import get_db
+    from app.indexes import bootstrap_indexes
+
+    with app.app_context():
+        return bootstrap_indexes(
+            get_db(),
+            create=app.config['MONGO_CREATE_INDEXES'],
+            strict=app.config['MONGO_INDEXES_STRICT'],
+        )
+
+
+def register_commands(app):
+    from app.database import get_db
+    from app.indexes import check_indexes, ensure_indexes
+
+    # Comando de linha de comando: flask indexes [--check | --bootstrap]
+    @app.cli.command('indexes')
+    @click.option('--check', is_flag=True, help='Apenas verifica, sem criar índices.')
+    @click.option('--bootstrap', is_flag=True,
+                  help='Segue MONGO_CREATE_INDEXES/MONGO_INDEXES_STRICT (usado antes de subir o servidor).')
+    def indexes_command(check, bootstrap):
+        if bootstrap:
+            if not bootstrap_app_indexes(app):
+                # A causa (índice ausente ou banco inacessível) já foi informada acima
+                click.echo("Índices obrigatórios ausentes ou não verificados (MONGO_INDEXES_STRICT ativo)", err=True)
+                raise SystemExit(1)
+            return
+
+        db = get_db()
+        if not check:
+            for error in ensure_indexes(db):
+                click.echo(f"Erro ao criar índice {error}")
+
+        report = check_indexes(db)
+        click.echo(f"Ausentes: {', '.join(report['missing']) or '-'}")
+        click.echo(f"Extras: {', '.join(report['extra']) or '-'}")
+        if report['missing']:
+            raise SystemExit(1)
+
+    # Comando de linha de comando: flask jobs-worker (executor dedicado da fila de tarefas)
+    @app.cli.command('jobs-worker')
+    @click.option('--workers', type=int, default=None, help='Threads de execução (padrão JOBS_WORKERS).')
+    def jobs_worker_command(workers):
+        from app.jobs import JOBS_WORKERS, JobRunner
+        click.echo("Executando a fila de tarefas (Ctrl+C para sair)")
+        JobRunner(app, workers or JOBS_WORKERS).run_forever()
+
+    # Comando de linha de comando: flask reminders [--once]
+    @app.cli.command('reminders')
+    @click.option('--once', is_flag=True, help='Executa um único ciclo (ex.: em um cron).')
+    def reminders_command(once):
+        from app.reminders import ReminderScheduler
+        scheduler = ReminderScheduler()
+        if once:
+            click.echo(f"Lembretes agendados: {scheduler.tick()}")
+            return
+        click.echo("Agendador de lembretes em execução (Ctrl+C para sair)")
+        scheduler.run_forever()
+
+    # Comando de linha de comando: flask rollups-rebuild
+    @app.cli.command('rollups-rebuild')
+    def rollups_rebuild_command():
+        from app.rollups import rebuild_rollups
+        click.echo(f"Agregados diários recalculados: {rebuild_rollups()}")
+
+    # Comando de linha de comando: flask barbers-reindex (campos da busca de barbeiros)
+    @app.cli.command('barbers-reindex')
+    def barbers_reindex_command():
+        from app.barber_search import reindex_barbers
+        click.echo(f"Barbeiros atualizados: {reindex_barbers()}")
+
+    # Comando de linha de comando: flask appointments-archive [--days N]
+    @app.cli.command('appointments-archive')
+    @click.option('--days', type=int, default=None, help='Idade mínima em dias (padrão ARCHIVE_AFTER_DAYS).')
+    @click.option('--batch-size', type=int, default=None, help='Agendamentos por lote (padrão ARCHIVE_BATCH_SIZE).')
+    def appointments_archive_command(days, batch_size):
+        from datetime import timedelta
+        from app.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_appointments
+        moved = archive_appointments(timedelta(days=days or ARCHIVE_AFTER_DAYS), batch_size or ARCHIVE_BATCH_SIZE)
+        click.echo(f"Agendamentos arquivados: {moved}")
+
+    # Comando de linha de comando: flask dates-migrate-legacy --before <data ISO>
+    @app.cli.command('dates-migrate-legacy')
+    @click.option('--before', required=True,
+                  help='Data/hora UTC (ISO-8601) do deploy da correção de fuso; só agendamentos criados antes dela.')
+    @click.option('--exclude', multiple=True,
+                  help='ID de um agendamento que não deve ser corrigido (ex.: resgate não reconhecido). Pode repetir.')
+    def dates_migrate_legacy_command(before, exclude):
+        from app.dates import UTC, parse_local
+        from app.legacy_dates import migrate_legacy_dates
+        fixed, slots = migrate_legacy_dates(parse_local(before, UTC), exclude=exclude)
+        click.echo(f"Agendamentos corrigidos: {fixed} (slots refeitos: {slots})")
+        click.echo("Rode `flask rollups-rebuild` para recalcular os agregados diários")
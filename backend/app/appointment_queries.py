@@ -0,0 +1,209 @@
+import base64
+from datetime import datetime
+from bson import ObjectId
+from app.archive import merge_sorted
+from app.catalog import get_barber, get_service
+from app.dates import formatter, parse_local, zone_for_barber
+
+# Limites de paginação das listagens
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def _lookup_stages(join_user_field, join_user_as):
+    # Junta o usuário (cliente) na mesma ida ao banco; serviços e barbeiros vêm do cache do catálogo
+    stages = []
+    if join_user_field:
+        stages.append({"$lookup": {
+            "from": "users",
+            "localField": join_user_field,
+            "foreignField": "_id",
+            "as": join_user_as,
+        }})
+
+    # Projeta apenas os campos que são efetivamente serializados
+    projection = {"date": 1, "status": 1, "service_id": 1, "barber_id": 1}
+    if join_user_field:
+        projection[f"{join_user_as}.fullname"] = 1
+    stages.append({"$project": projection})
+    return stages
+
+
+def _first(docs):
+    # $lookup sempre devolve uma lista; pega o primeiro documento, se houver
+    return docs[0] if docs else None
+
+
+def encode_cursor(appointment):
+    # Cursor opaco com a chave de ordenação (date, _id) do último item da página
+    raw = f"{appointment['date'].isoformat()}|{appointment['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        date, _id = raw.split("|")
+        return datetime.fromisoformat(date), ObjectId(_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _parse_date(value, zone=None):
+    # Aceita "YYYY-MM-DD" ou "YYYY-MM-DD HH:MM:SS" no horário local de `zone`
+    try:
+        return parse_local(value, zone)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value}")
+
+
+def parse_page_args(args, zone=None):
+    """Lê limit/after/from/to da query string. Lança ValueError se inválidos."""
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("Invalid limit")
+    if limit < 1:
+        raise ValueError("Invalid limit")
+
+    after = args.get("after")
+    date_from = args.get("from")
+    date_to = args.get("to")
+
+    return {
+        "limit": min(limit, MAX_PAGE_SIZE),
+        "after": decode_cursor(after) if after else None,
+        "date_from": _parse_date(date_from, zone) if date_from else None,
+        "date_to": _parse_date(date_to, zone) if date_to else None,
+    }
+
+
+def _page_match(match, date_from=None, date_to=None, after=None, status=None):
+    if status:
+        match["status"] = status
+    date_range = {}
+    if date_from:
+        date_range["$gte"] = date_from
+    if date_to:
+        date_range["$lt"] = date_to
+    if date_range:
+        match["date"] = date_range
+
+    if after:
+        # Keyset: tudo que vem depois de (date, _id) na ordenação
+        after_date, after_id = after
+        match["$or"] = [
+            {"date": {"$gt": after_date}},
+            {"date": after_date, "_id": {"$gt": after_id}},
+        ]
+    return match
+
+
+def _paged_pipeline(match, join_user_field, join_user_as, limit):
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"date": 1, "_id": 1}},
+    ]
+    if limit:
+        # Um item a mais indica se existe próxima página
+        pipeline.append({"$limit": limit + 1})
+    return pipeline + _lookup_stages(join_user_field, join_user_as)
+
+
+def _paginate(cursor, limit):
+    docs = list(cursor)
+    next_cursor = None
+    if limit and len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+    return docs, next_cursor
+
+
+def _aggregate(collection, archive, pipeline, session):
+    # Com o arquivo, a mesma página é buscada nas duas coleções e intercalada pela ordenação
+    if archive is None:
+        return collection.aggregate(pipeline, session=session)
+    return merge_sorted([
+        collection.aggregate(pipeline, session=session),
+        archive.aggregate(pipeline, session=session),
+    ])
+
+
+def barber_appointments(collection, barber_id, limit=None, archive=None, session=None, **filters):
+    match = _page_match({"barber_id": ObjectId(barber_id)}, **filters)
+    pipeline = _paged_pipeline(match, "user_id", "user", limit)
+    return _paginate(_aggregate(collection, archive, pipeline, session), limit)
+
+
+def user_appointments(collection, user_id, limit=None, archive=None, session=None, **filters):
+    match = _page_match({"user_id": ObjectId(user_id)}, **filters)
+    pipeline = _paged_pipeline(match, None, None, limit)
+    return _paginate(_aggregate(collection, archive, pipeline, session), limit)
+
+
+class _Lookups:
+    """Serviço, barbeiro e formatador de datas resolvidos uma vez por ID ao serializar uma página."""
+
+    def __init__(self):
+        self._services = {}
+        self._barbers = {}
+        self._formatters = {}
+
+    def service(self, service_id):
+        if service_id not in self._services:
+            self._services[service_id] = get_service(service_id)
+        return self._services[service_id]
+
+    def barber(self, barber_id):
+        if barber_id not in self._barbers:
+            self._barbers[barber_id] = get_barber(barber_id)
+        return self._barbers[barber_id]
+
+    def format_date(self, date, barber_id):
+        format_date = self._formatters.get(barber_id)
+        if format_date is None:
+            format_date = self._formatters[barber_id] = formatter(zone_for_barber(barber_id))
+        return format_date(date)
+
+
+def serialize_barber_appointment(appointment, lookups=None):
+    lookups = lookups or _Lookups()
+    user = _first(appointment.get("user"))
+    service = lookups.service(appointment["service_id"])
+
+    return {
+        "_id": appointment["_id"],
+        "service_id": appointment["service_id"],
+        "date": lookups.format_date(appointment["date"], appointment["barber_id"]),
+        "status": appointment["status"],
+        "user_name": user["fullname"] if user else "Unknown User",
+        "service_name": service["name"] if service else "Unknown Service",
+        "service_value": service["value"] if service else "Unknown Value",
+        "service_duration": service["duration"] if service else "Unknown Duration",
+    }
+
+
+def serialize_user_appointment(appointment, lookups=None):
+    lookups = lookups or _Lookups()
+    barber = lookups.barber(appointment["barber_id"])
+    service = lookups.service(appointment["service_id"])
+
+    return {
+        "service_id": appointment["service_id"],
+        "service_name": service["name"] if service else "Unknown",
+        "service_duration": service["duration"] if service else "Unknown",
+        "service_value": service["value"] if service else "Unknown",
+        "barber": barber["fullname"] if barber else "Unknown",
+        "date": lookups.format_date(appointment["date"], appointment["barber_id"]),
+        "status": appointment["status"],
+    }
+
+
+def serialize_barber_appointments(appointments):
+    lookups = _Lookups()
+    return [serialize_barber_appointment(a, lookups) for a in appointments]
+
+
+def serialize_user_appointments(appointments):
+    lookups = _Lookups()
+    return [serialize_user_appointment(a, lookups) for a in appointments]
@@ -1,28 +1,60 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta
-import pytz  # Para corrigir fusos horários se você quiser mais controle (opcional)
+import json
+import os
+import time
 from bson.objectid import ObjectId
-from app import app
+from app.archive import current_version as archive_version, reaches_archive
+from app.auth import current_role, role_required
+from app.bulk import export_csv, export_cursor, export_ndjson, import_appointments, parse_ndjson
+from app.catalog import get_barber, get_service, refresh as refresh_catalog
+from app.changefeed import get_feed
+from app.database import collection
+from app.dates import format_for_barber, format_local, local_datetime, parse_for_barber, parse_local, zone_for_barber
+from app.tasks import after_booking, after_cancellation
+from app.availability import (
+    BUSINESS_HOURS_END,
+    BUSINESS_HOURS_START,
+    SLOT_MINUTES,
+    book_appointment,
+    booked_intervals,
+    cancel_appointment,
+    free_slots,
+    on_grid,
+    service_duration,
+)
 
 # Criar o Blueprint para as rotas de agendamento
 bp = Blueprint('appointments_routes', __name__, url_prefix='/appointments')
 
-# Referenciar as coleções do banco de dados
-appointments_collection = app.db['appointments']
-users_collection = app.db['users']
-services_collection = app.db['services']
-
-# Função para converter a hora local para UTC
-def convert_to_utc(local_date_str, user_timezone='America/Sao_Paulo'):
-    # Adicionando o fuso horário de São Paulo, por exemplo
-    local_time = datetime.strptime(local_date_str, "%Y-%m-%d %H:%M:%S")
-    
-    # Se não precisar usar o pytz, defina o fuso manualmente
-    local_time = local_time - timedelta(hours=3)  # Ajuste para o fuso horário de SP (UTC-3)
-    utc_time = local_time  # Simplesmente ajustando o horário para UTC-0
-    
-    return utc_time
+appointments_collection = collection('appointments')
+
+# Stream SSE: intervalo dos comentários keepalive, duração máxima da conexão e
+# espera sugerida ao navegador antes de reconectar
+SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_MAX_SECONDS = float(os.getenv('SSE_MAX_SECONDS', '300'))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', '3000'))
+# "auto": só com o worker gevent, em que cada conexão ocupa uma greenlet e não uma das
+# poucas threads do worker gthread; "true"/"false" forçam (ex.: servidor de desenvolvimento)
+SSE_ENABLED = os.getenv('SSE_ENABLED', 'auto')
+
+
+def sse_available():
+    if SSE_ENABLED != 'auto':
+        return SSE_ENABLED == 'true'
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+# Função para converter a hora local (fuso IANA, padrão SHOP_TIMEZONE) para UTC
+def convert_to_utc(local_date_str, zone=None):
+    return parse_local(local_date_str, zone)
+
+# Função inversa de convert_to_utc, para devolver horários ao cliente
+def convert_from_utc(utc_time, zone=None):
+    return format_local(utc_time, zone)
 
 # Rota para criar um novo agendamento
 @bp.route('/add', methods=['POST'])
@@ -39,12 +71,15 @@ def create_appointment():
     if not barber_id or not service_id or not date:
         return jsonify({"msg": "Barber, service, and date are required"}), 400
 
+    # Barbeiro novo ou serviço alterado em outro worker
+    refresh_catalog()
+
     # Verificar se o barber_id é um ObjectId válido
     if not ObjectId.is_valid(barber_id):
         return jsonify({"msg": "Invalid barber ID"}), 400
 
     # Buscar o barbeiro no banco de dados
-    barber = users_collection.find_one({"_id": ObjectId(barber_id), "role": "barber"})
+    barber = get_barber(barber_id)
     if not barber:
         return jsonify({"msg": "Barber not found"}), 404
 
@@ -53,16 +88,21 @@ def create_appointment():
         return jsonify({"msg": "Invalid service ID"}), 400
 
     # Opcional: Verificar se o serviço existe (caso tenha uma coleção de serviços)
-    service = services_collection.find_one({"_id": ObjectId(service_id)})
+    service = get_service(service_id)
     if not service:
         return jsonify({"msg": "Service not found"}), 404
 
+    zone = zone_for_barber(barber_id)
     try:
-        # Converter a data recebida para UTC
-        appointment_date = convert_to_utc(date)
+        # Converter a data recebida (horário local do barbeiro) para UTC
+        appointment_date = convert_to_utc(date, zone)
     except ValueError:
         return jsonify({"msg": "Invalid date format. Expected format: YYYY-MM-DD HH:MM:SS"}), 400
 
+    # Fora da grade os slots ficariam parcialmente ocupados; fora do expediente, nem existem
+    if not on_grid(appointment_date, zone, service_duration(service_id)):
+        return jsonify({"msg": f"Appointments must start on a {SLOT_MINUTES}-minute slot between {BUSINESS_HOURS_START} and {BUSINESS_HOURS_END}"}), 400
+
     # Criar o objeto de agendamento
     appointment_data = {
         "user_id": ObjectId(user_id),  # Certifique-se de que o user_id seja um ObjectId
@@ -72,7 +112,188 @@ def create_appointment():
         "status": "scheduled"  # Define o status inicial como 'scheduled'
     }
 
-    # Inserir o agendamento no banco de dados
-    appointments_collection.insert_one(appointment_data)
+    # Inserir o agendamento somente se o horário do barbeiro estiver livre
+    appointment_id = book_appointment(appointment_data)
+    if not appointment_id:
+        return jsonify({"msg": "This time slot is not available for this barber"}), 409
+
+    after_booking([{"_id": appointment_id, **appointment_data}])
+
+    return jsonify({"msg": "Appointment created successfully!", "appointment_id": str(appointment_id)}), 201
+
+
+# Rota para consultar os horários livres de um barbeiro em um dia
+@bp.route('/availability', methods=['GET'])
+@jwt_required()
+def get_availability():
+    barber_id = request.args.get('barber_id')
+    day = request.args.get('date')
+    service_id = request.args.get('service_id')
+
+    if not barber_id or not day:
+        return jsonify({"msg": "Barber and date are required"}), 400
+
+    refresh_catalog()
+    if not get_barber(barber_id):
+        return jsonify({"msg": "Barber not found"}), 404
+
+    # Sem serviço informado, considera a duração de um slot
+    if service_id and not get_service(service_id):
+        return jsonify({"msg": "Service not found"}), 404
+    duration = service_duration(service_id)
+
+    zone = zone_for_barber(barber_id)
+    try:
+        # Janela do expediente (horário local do barbeiro) convertida para UTC
+        window_start = local_datetime(day, BUSINESS_HOURS_START, zone)
+        window_end = local_datetime(day, BUSINESS_HOURS_END, zone)
+    except ValueError:
+        return jsonify({"msg": "Invalid date format. Expected format: YYYY-MM-DD"}), 400
+
+    intervals = booked_intervals(barber_id, window_start, window_end)
+    slots = free_slots(intervals, window_start, window_end, duration)
+
+    return jsonify({
+        "barber_id": barber_id,
+        "date": day,
+        "duration": int(duration.total_seconds() // 60),
+        "slots": [convert_from_utc(slot, zone) for slot in slots],
+        "booked": [
+            {"start": convert_from_utc(start, zone), "end": convert_from_utc(end, zone)}
+            for start, end in intervals
+        ],
+    }), 200
+
+
+# Rota para importar agendamentos em lote (JSON ou NDJSON)
+@bp.route('/import', methods=['POST'])
+@role_required('admin')
+def import_appointments_bulk():
+    if request.mimetype == 'application/x-ndjson':
+        # Um agendamento por linha, lido aos poucos
+        rows = parse_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get('appointments') if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            return jsonify({"msg": "Expected a list of appointments"}), 400
+
+    # Uma leitura de versões por importação; as linhas usam o catálogo em memória
+    refresh_catalog()
+    inserted, errors = import_appointments(rows, parse_for_barber)
+
+    status = 201 if inserted else 400
+    return jsonify({"inserted": inserted, "rejected": len(errors), "errors": errors}), status
+
+
+# Rota para exportar agendamentos em NDJSON ou CSV, transmitidos direto do cursor
+@bp.route('/export', methods=['GET'])
+@role_required('admin', 'barber')
+def export_appointments():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"msg": "Format must be 'ndjson' or 'csv'"}), 400
+
+    query = {}
+    barber_id = request.args.get('barber_id')
+    if current_role() == 'barber':
+        # Barbeiros só exportam a própria agenda
+        barber_id = get_jwt_identity()
+    if barber_id:
+        if not ObjectId.is_valid(barber_id):
+            return jsonify({"msg": "Invalid barber ID"}), 400
+        query["barber_id"] = ObjectId(barber_id)
+
+    try:
+        date_range = {}
+        # Filtros no horário local do barbeiro (ou da barbearia, sem barbeiro)
+        zone = zone_for_barber(barber_id)
+        if request.args.get('from'):
+            date_range["$gte"] = convert_to_utc(request.args['from'], zone)
+        if request.args.get('to'):
+            date_range["$lt"] = convert_to_utc(request.args['to'], zone)
+    except ValueError:
+        return jsonify({"msg": "Invalid date format. Expected format: YYYY-MM-DD HH:MM:SS"}), 400
+    if date_range:
+        query["date"] = date_range
+
+    cursor = export_cursor(query, reaches_archive(date_range.get("$gte"), version=archive_version()))
+    if export_format == 'csv':
+        body, mimetype = export_csv(cursor, format_for_barber), 'text/csv'
+    else:
+        body, mimetype = export_ndjson(cursor, format_for_barber), 'application/x-ndjson'
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=appointments.{export_format}'
+    return response
+
+
+# Rota para cancelar um agendamento (cliente, barbeiro do agendamento ou admin)
+@bp.route('/delete/<appointment_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_appointment_route(appointment_id):
+    if not ObjectId.is_valid(appointment_id):
+        return jsonify({"msg": "Invalid appointment ID"}), 400
+
+    user_id = get_jwt_identity()
+    owner_id = None if current_role() == 'admin' else user_id
+
+    # Verifica (dono e status), cancela e libera os slots
+    appointment = cancel_appointment(appointment_id, owner_id)
+    if not appointment:
+        # Caminho de erro: descobre por que o agendamento não pôde ser cancelado
+        existing = appointments_collection.find_one(
+            {"_id": ObjectId(appointment_id)}, {"status": 1, "user_id": 1, "barber_id": 1}
+        )
+        if not existing:
+            return jsonify({"msg": "Appointment not found"}), 404
+        if owner_id and ObjectId(owner_id) not in (existing["user_id"], existing["barber_id"]):
+            return jsonify({"msg": "You are not authorized to cancel this appointment"}), 403
+        return jsonify({"msg": "Only scheduled appointments can be cancelled"}), 400
+
+    after_cancellation(appointment)
+
+    return jsonify({"msg": "Appointment cancelled successfully!"}), 200
+
+
+def _sse(event_type, data, dumps=json.dumps):
+    return f"event: {event_type}\ndata: {dumps(data)}\n\n"
+
+
+# Rota SSE com as mudanças da agenda de um barbeiro (created/completed/cancelled)
+# O EventSource do navegador não envia cabeçalhos: o token também é aceito em ?jwt=
+@bp.route('/stream/<barber_id>', methods=['GET'])
+@role_required('barber', 'admin', locations=['headers', 'query_string'])
+def stream_barber_appointments(barber_id):
+    if not ObjectId.is_valid(barber_id):
+        return jsonify({"msg": "Invalid barber ID"}), 400
+    if current_role() == 'barber' and barber_id != get_jwt_identity():
+        return jsonify({"msg": "Access forbidden: You can only follow your own appointments"}), 403
+    if not sse_available():
+        # O cliente passa a consultar a listagem periodicamente (GET condicional)
+        return jsonify({"msg": "Live updates are not available; poll the appointments listing"}), 503
+
+    feed = get_feed()
+    subscription = feed.subscribe(barber_id)
+    # O gerador roda fora do contexto da requisição: guarda o serializador do app
+    dumps = current_app.json.dumps
+
+    def events():
+        # Conexões encerradas após SSE_MAX_SECONDS: o EventSource reconecta sozinho e a
+        # conexão pode ir para outro worker
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield _sse(*event, dumps=dumps)
+        finally:
+            feed.unsubscribe(subscription)
 
-    return jsonify({"msg": "Appointment created successfully!"}), 201
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Sem buffer em proxies (nginx)
+    return response
@@ -0,0 +1,108 @@
+# Arquivamento dos agendamentos antigos: os concluídos há mais de ARCHIVE_AFTER_DAYS
+# saem de `appointments` para `appointments_archive`, mantendo a coleção quente (e os
+# seus índices) pequena. Rode com `flask appointments-archive` (ex.: diariamente em um cron).
+#
+# A fronteira do arquivo ({"_id": "appointments", "archived_before": datetime} em
+# archive_state) é gravada antes de mover os documentos; as listagens só consultam
+# o arquivo quando o intervalo pedido começa antes dela.
+import heapq
+import os
+from datetime import timedelta
+
+from pymongo.errors import BulkWriteError
+
+from app import versions
+from app.cache import TTLCache
+from app.database import collection
+from app.dates import as_utc, utcnow
+from app.metrics import register_cache
+
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+
+# Chave em collection_versions: muda a cada avanço da fronteira
+ARCHIVE_VERSION_KEY = "appointments_archive"
+
+appointments_collection = collection('appointments')
+archive_collection = collection('appointments_archive')
+state_collection = collection('archive_state')
+slots_collection = collection('appointment_slots')
+
+state_cache = TTLCache(maxsize=1, ttl=int(os.getenv('CATALOG_CACHE_TTL', '300')))
+register_cache('archive_state', state_cache)
+
+
+def archived_before(version=None):
+    """Data (UTC) antes da qual pode haver agendamentos arquivados, ou None se nada foi arquivado."""
+    state = state_cache.get("state")
+    # Versão conhecida diferente da carregada: outro processo avançou a fronteira
+    if state is None or (version is not None and state["version"] != version):
+        doc = state_collection.find_one({"_id": "appointments"})
+        before = doc.get("archived_before") if doc else None
+        state = {"before": as_utc(before) if before else None, "version": version}
+        state_cache.set("state", state)
+    return state["before"]
+
+
+def current_version():
+    return versions.current([ARCHIVE_VERSION_KEY])[ARCHIVE_VERSION_KEY][0]
+
+
+def reaches_archive(date_from=None, after=None, version=None):
+    """True se a consulta (a partir de date_from e/ou do cursor after) pode incluir agendamentos arquivados."""
+    before = archived_before(version)
+    if before is None:
+        return False
+    starts = [as_utc(d) for d in (date_from, after[0] if after else None) if d is not None]
+    return not starts or max(starts) < before
+
+
+def merge_sorted(cursors):
+    """Junta cursores ordenados por (date, _id) em uma única sequência ordenada.
+
+    Durante um arquivamento interrompido o mesmo agendamento pode estar nas duas
+    coleções; a cópia repetida (adjacente na ordenação) é descartada.
+    """
+    last_id = None
+    for doc in heapq.merge(*cursors, key=lambda a: (as_utc(a["date"]), a["_id"])):
+        if doc["_id"] != last_id:
+            last_id = doc["_id"]
+            yield doc
+
+
+def archive_appointments(older_than=timedelta(days=ARCHIVE_AFTER_DAYS), batch_size=ARCHIVE_BATCH_SIZE, now=None):
+    """Move os concluídos anteriores a now - older_than em lotes. Retorna quantos foram movidos.
+
+    Cada lote é copiado e só então removido da coleção quente: uma execução
+    interrompida é retomada pela seguinte sem perder nem duplicar agendamentos.
+    """
+    cutoff = (now or utcnow()) - older_than
+
+    # Fronteira primeiro: quem ler a nova versão já inclui o arquivo nas consultas
+    state_collection.update_one(
+        {"_id": "appointments"}, {"$max": {"archived_before": cutoff}}, upsert=True
+    )
+    versions.bump(ARCHIVE_VERSION_KEY)
+    state_cache.invalidate()
+
+    moved = 0
+    while True:
+        batch = list(appointments_collection.find(
+            {"status": "completed", "date": {"$lt": cutoff}}
+        ).limit(batch_size))
+        if not batch:
+            break
+
+        try:
+            archive_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Cópias deixadas por uma execução interrompida já estão no arquivo
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+        ids = [a["_id"] for a in batch]
+        appointments_collection.delete_many({"_id": {"$in": ids}})
+        # Reservas de horários passados não bloqueiam mais nada
+        slots_collection.delete_many({"appointment_id": {"$in": ids}})
+        moved += len(ids)
+    return moved
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from bson import ObjectId
+from flask import jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from pymongo.errors import DuplicateKeyError
+
+from app import jwt
+from app.database import collection
+from app.cache import TTLCache
+from app.metrics import register_cache
+
+# O role vem da claim do token; o banco só é consultado para tokens antigos sem a claim
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+# Intervalo para sincronizar a lista de tokens revogados entre os workers
+REVOCATION_REFRESH_SECONDS = int(os.getenv('REVOCATION_REFRESH_SECONDS', '30'))
+
+users_collection = collection('users')
+# Documentos expiram sozinhos (índice TTL em expires_at) quando o token venceria
+revoked_collection = collection('revoked_tokens')
+
+users_cache = TTLCache(maxsize=10000, ttl=USER_CACHE_TTL)
+register_cache('users', users_cache)
+
+_revoked = set()
+_revoked_lock = threading.Lock()
+_revoked_synced_at = 0.0
+
+
+def _role_from_db(user_id):
+    role = users_cache.get(user_id)
+    if role is None:
+        user = users_collection.find_one({"_id": ObjectId(user_id)}, {"role": 1})
+        if not user:
+            return None
+        role = user.get('role')
+        users_cache.set(user_id, role)
+    return role
+
+
+def current_role():
+    """Role do usuário autenticado, lido da claim do JWT."""
+    role = get_jwt().get('role')
+    if role is None:
+        role = _role_from_db(get_jwt_identity())
+    return role
+
+
+def role_required(*roles, locations=None):
+    """Exige um JWT válido com um dos roles informados, sem ir ao banco."""
+    def decorator(fn):
+        @wraps(fn)
+        @jwt_required(locations=locations)
+        def wrapper(*args, **kwargs):
+            if current_role() not in roles:
+                return jsonify({"msg": "Access forbidden: Insufficient permissions"}), 403
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _sync_revoked():
+    global _revoked_synced_at
+    now = time.monotonic()
+    if now - _revoked_synced_at < REVOCATION_REFRESH_SECONDS:
+        return
+
+    # A coleção só guarda tokens ainda não vencidos, então é pequena
+    jtis = {doc['jti'] for doc in revoked_collection.find({}, {"jti": 1})}
+    with _revoked_lock:
+        # Substitui o conjunto local para descartar os tokens já vencidos
+        _revoked.clear()
+        _revoked.update(jtis)
+        _revoked_synced_at = now
+
+
+def revoke_token(jti, exp):
+    """Revoga um token até a sua expiração (exp em segundos desde a época)."""
+    try:
+        revoked_collection.insert_one({
+            "jti": jti,
+            "expires_at": datetime.fromtimestamp(exp, tz=timezone.utc),
+        })
+    except DuplicateKeyError:
+        pass
+    with _revoked_lock:
+        _revoked.add(jti)
+
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    _sync_revoked()
+    return jwt_payload['jti'] in _revoked
@@ -0,0 +1,232 @@
+import os
+from bisect import bisect_left
+from datetime import timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.database import collection
+from app.catalog import get_service
+from app.changefeed import publish
+from app.dates import UTC, as_utc, get_zone, utcnow
+from app.versions import bump_appointments
+
+# Granularidade da agenda e maior duração possível de um serviço (minutos)
+SLOT_MINUTES = int(os.getenv('SLOT_MINUTES', '30'))
+MAX_SERVICE_MINUTES = 60
+
+# Horário de funcionamento (hora local, "HH:MM")
+BUSINESS_HOURS_START = os.getenv('BUSINESS_HOURS_START', '09:00')
+BUSINESS_HOURS_END = os.getenv('BUSINESS_HOURS_END', '18:00')
+
+appointments_collection = collection('appointments')
+# Uma reserva por (barbeiro, slot): o índice unique torna a marcação atômica
+slots_collection = collection('appointment_slots')
+
+
+class BookedIntervals:
+    """Intervalos [início, fim) ocupados, ordenados e mesclados para busca binária."""
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                # Sobrepõe ou encosta no anterior: mescla
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def overlaps(self, start, end):
+        # Último intervalo que começa antes do fim pedido
+        i = bisect_left(self.starts, end) - 1
+        return i >= 0 and self.ends[i] > start
+
+    def __iter__(self):
+        return iter(zip(self.starts, self.ends))
+
+
+def service_duration(service_id):
+    service = get_service(service_id)
+    return timedelta(minutes=service["duration"] if service else SLOT_MINUTES)
+
+
+def booked_intervals(barber_id, window_start, window_end):
+    """Carrega os agendamentos do barbeiro que tocam a janela em uma única consulta indexada."""
+    return booked_intervals_many([barber_id], window_start, window_end)[ObjectId(barber_id)]
+
+
+def booked_intervals_many(barber_ids, window_start, window_end):
+    """Intervalos ocupados de vários barbeiros na mesma janela: {barber_id: BookedIntervals}."""
+    barber_ids = [ObjectId(barber_id) for barber_id in barber_ids]
+    appointments = appointments_collection.find(
+        {
+            "barber_id": {"$in": barber_ids},
+            # Agendamentos que começam antes da janela ainda podem invadi-la
+            "date": {
+                "$gte": window_start - timedelta(minutes=MAX_SERVICE_MINUTES),
+                "$lt": window_end,
+            },
+            "status": {"$ne": "cancelled"},
+        },
+        {"barber_id": 1, "date": 1, "service_id": 1},
+    )
+
+    intervals = {barber_id: [] for barber_id in barber_ids}
+    for a in appointments:
+        start = as_utc(a["date"])
+        intervals[a["barber_id"]].append((start, start + service_duration(a["service_id"])))
+    return {barber_id: BookedIntervals(found) for barber_id, found in intervals.items()}
+
+
+def free_slots(intervals, window_start, window_end, duration):
+    """Horários de início livres na janela para um serviço com a duração dada."""
+    step = timedelta(minutes=SLOT_MINUTES)
+    slots = []
+    start = window_start
+    while start + duration <= window_end:
+        if not intervals.overlaps(start, start + duration):
+            slots.append(start)
+        start += step
+    return slots
+
+
+def _slot_keys(start, duration):
+    # Slots de [start, start + duration) a partir do próprio início: como os agendamentos
+    # começam na grade (on_grid), horários sobrepostos sempre disputam a mesma chave
+    step = timedelta(minutes=SLOT_MINUTES)
+    keys = []
+    slot = start
+    while slot < start + duration:
+        keys.append(slot)
+        slot += step
+    return keys
+
+
+def _at(local, time_of_day):
+    # Horário "HH:MM" no dia local de `local` (abertura e fechamento do expediente)
+    hour, minute = (int(part) for part in time_of_day.split(':'))
+    return local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def on_grid(start, zone=None, duration=timedelta(0)):
+    """True se `start` cai na grade do expediente, no horário local.
+
+    A grade começa na abertura e anda de SLOT_MINUTES em SLOT_MINUTES; o serviço
+    (`duration`) precisa terminar até o fechamento, como em free_slots.
+    """
+    local = as_utc(start).astimezone(zone or get_zone())
+    opening = _at(local, BUSINESS_HOURS_START)
+    if local < opening or local + duration > _at(local, BUSINESS_HOURS_END):
+        return False
+    return (local - opening) % timedelta(minutes=SLOT_MINUTES) == timedelta(0)
+
+
+def next_slot_start(now, zone=None, duration=timedelta(0)):
+    """Primeiro horário da grade do expediente a partir de `now` (UTC).
+
+    Antes da abertura, é a abertura do dia; se o serviço não couber mais no dia,
+    a abertura do dia seguinte.
+    """
+    local = as_utc(now).astimezone(zone or get_zone())
+    opening = _at(local, BUSINESS_HOURS_START)
+    step = timedelta(minutes=SLOT_MINUTES)
+    start = max(opening, opening - ((opening - local) // step) * step)
+    if start + duration > _at(local, BUSINESS_HOURS_END):
+        start = _at(local + timedelta(days=1), BUSINESS_HOURS_START)
+    return start.astimezone(UTC)
+
+
+def claim_slots(barber_id, start, duration, appointment_id):
+    """Reserva atomicamente os slots do barbeiro. Retorna False se algum já estiver ocupado."""
+    docs = [
+        {"barber_id": ObjectId(barber_id), "slot": slot, "appointment_id": appointment_id}
+        for slot in _slot_keys(start, duration)
+    ]
+    try:
+        slots_collection.insert_many(docs, ordered=True)
+        return True
+    except BulkWriteError:
+        # Desfaz o que chegou a ser reservado antes do conflito
+        release_slots(appointment_id)
+        return False
+
+
+def claim_slots_many(appointments):
+    """Reserva os slots de um lote de agendamentos (cada um com `_id`) em uma única escrita.
+
+    Retorna os _id dos que colidiram com outra reserva; esses ficam sem nenhum slot.
+    """
+    docs = [
+        {"barber_id": a["barber_id"], "slot": slot, "appointment_id": a["_id"]}
+        for a in appointments
+        for slot in _slot_keys(a["date"], service_duration(a["service_id"]))
+    ]
+    if not docs:
+        return set()
+    try:
+        # Não ordenado: um conflito não impede a reserva dos demais agendamentos
+        slots_collection.insert_many(docs, ordered=False)
+        return set()
+    except BulkWriteError as e:
+        failed = {docs[error["index"]]["appointment_id"] for error in e.details["writeErrors"]}
+        release_slots_many(failed)
+        return failed
+
+
+def release_slots(appointment_id):
+    slots_collection.delete_many({"appointment_id": appointment_id})
+
+
+def release_slots_many(appointment_ids):
+    if appointment_ids:
+        slots_collection.delete_many({"appointment_id": {"$in": list(appointment_ids)}})
+
+
+def book_appointment(appointment_data):
+    """Insere o agendamento se o horário estiver livre. Retorna o _id ou None em caso de conflito."""
+    barber_id = appointment_data["barber_id"]
+    start = appointment_data["date"]
+    duration = service_duration(appointment_data["service_id"])
+
+    # Agendamentos antigos não têm slots reservados: confere também os intervalos
+    if booked_intervals(barber_id, start, start + duration).overlaps(start, start + duration):
+        return None
+
+    appointment_id = ObjectId()
+    if not claim_slots(barber_id, start, duration, appointment_id):
+        return None
+
+    appointment = {"_id": appointment_id, **appointment_data}
+    try:
+        appointments_collection.insert_one(appointment)
+    except PyMongoError:
+        release_slots(appointment_id)
+        raise
+
+    bump_appointments([appointment])
+    publish("created", [appointment])
+    return appointment_id
+
+
+def cancel_appointment(appointment_id, owner_id=None):
+    """Cancela um agendamento ainda marcado e libera os slots do horário.
+
+    Com owner_id, só cancela se ele for o cliente ou o barbeiro do agendamento.
+    Retorna o agendamento ou None se a condição não foi satisfeita.
+    """
+    query = {"_id": ObjectId(appointment_id), "status": "scheduled"}
+    if owner_id is not None:
+        query["$or"] = [{"user_id": ObjectId(owner_id)}, {"barber_id": ObjectId(owner_id)}]
+
+    appointment = appointments_collection.find_one_and_update(
+        query,
+        {"$set": {"status": "cancelled", "cancelled_at": utcnow()}},
+        projection={"user_id": 1, "barber_id": 1, "service_id": 1, "date": 1, "status": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if appointment:
+        release_slots(appointment["_id"])
+        bump_appointments([appointment])
+        publish("cancelled", [appointment])
+    return appointment
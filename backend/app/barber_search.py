@@ -0,0 +1,222 @@
+# Busca no diretório de barbeiros: prefixo do nome, serviço oferecido e horário livre em um dia.
+# O nome é indexado em `name_tokens` (palavras sem acento e em minúsculas): cada palavra
+# digitada vira um prefixo ancorado ("^jo"), que percorre só um trecho do índice
+# {role, name_tokens}. A ordenação e a paginação usam (name_sort, _id).
+#
+# Barbeiros sem o campo `services` (lista de IDs) atendem todos os serviços.
+# Cadastros anteriores à busca recebem os campos com `flask barbers-reindex`.
+import base64
+import os
+import re
+import unicodedata
+from datetime import timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+
+from app.availability import (
+    BUSINESS_HOURS_END,
+    BUSINESS_HOURS_START,
+    SLOT_MINUTES,
+    booked_intervals_many,
+    free_slots,
+    service_duration,
+)
+from app.cache import TTLCache
+from app.catalog import CACHE_TTL
+from app.database import collection
+from app.dates import format_local, local_datetime, utcnow, zone_for_barber
+from app.metrics import register_cache
+
+# Limites de paginação da busca
+SEARCH_DEFAULT_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Resultados por chave de consulta. Sem filtro de dia dependem só do diretório (a versão
+# de "barbers" faz parte da chave); com ele, também da agenda, e expiram em poucos segundos
+SEARCH_CACHE_SIZE = int(os.getenv('BARBER_SEARCH_CACHE_SIZE', '1024'))
+SEARCH_AVAILABILITY_TTL = int(os.getenv('BARBER_SEARCH_AVAILABILITY_TTL', '15'))
+
+results_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=CACHE_TTL)
+availability_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_AVAILABILITY_TTL)
+register_cache('barber_search', results_cache)
+register_cache('barber_search_availability', availability_cache)
+
+users_collection = collection('users')
+
+# Só o que o diretório exibe (o email não sai na busca)
+_PROJECTION = {"fullname": 1, "name_sort": 1}
+
+
+def normalize(text):
+    """Palavras do texto sem acento e em minúsculas ("João da Silva" -> ["joao", "da", "silva"])."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return re.findall(r"\w+", stripped.casefold())
+
+
+def search_fields(fullname):
+    """Campos derivados do nome gravados junto com o barbeiro."""
+    tokens = normalize(fullname)
+    return {"name_tokens": tokens, "name_sort": " ".join(tokens)}
+
+
+def reindex_barbers():
+    """Recalcula os campos de busca de todos os barbeiros. Retorna quantos foram alterados."""
+    updates = []
+    for barber in users_collection.find({"role": "barber"}, {"fullname": 1, "name_tokens": 1, "name_sort": 1}):
+        fields = search_fields(barber.get("fullname"))
+        if any(barber.get(field) != value for field, value in fields.items()):
+            updates.append(UpdateOne({"_id": barber["_id"]}, {"$set": fields}))
+    if updates:
+        users_collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def encode_cursor(barber):
+    # Cursor opaco com a chave de ordenação (name_sort, _id) do último item da página
+    raw = f"{barber.get('name_sort') or ''}|{barber['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        name_sort, _id = raw.rsplit("|", 1)
+        return name_sort, ObjectId(_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_search_args(args):
+    """Lê q/service_id/date/limit/after da query string. Lança ValueError se inválidos."""
+    try:
+        limit = int(args.get("limit", SEARCH_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("Invalid limit")
+    if limit < 1:
+        raise ValueError("Invalid limit")
+
+    service_id = args.get("service_id")
+    if service_id and not ObjectId.is_valid(service_id):
+        raise ValueError("Invalid service ID")
+
+    after = args.get("after")
+    return {
+        "terms": tuple(normalize(args.get("q"))),
+        "service_id": ObjectId(service_id) if service_id else None,
+        "day": args.get("date") or None,
+        "limit": min(limit, SEARCH_MAX_PAGE_SIZE),
+        "after": decode_cursor(after) if after else None,
+    }
+
+
+def _query(terms, service_id, after):
+    conditions = [{"role": "barber"}]
+    # Prefixo ancorado e sem acento: usa o índice {role, name_tokens}
+    conditions += [{"name_tokens": {"$regex": f"^{re.escape(term)}"}} for term in terms]
+    if service_id:
+        conditions.append({"$or": [{"services": service_id}, {"services": {"$exists": False}}]})
+    if after:
+        # Keyset: tudo que vem depois de (name_sort, _id) na ordenação
+        after_name, after_id = after
+        conditions.append({"$or": [
+            {"name_sort": {"$gt": after_name}},
+            {"name_sort": after_name, "_id": {"$gt": after_id}},
+        ]})
+    return {"$and": conditions}
+
+
+def _find(query, limit):
+    return list(
+        users_collection.find(query, _PROJECTION)
+        .sort([("name_sort", ASCENDING), ("_id", ASCENDING)])
+        .limit(limit)
+    )
+
+
+def _first_slot_from(window_start, now):
+    # Primeiro horário da grade do expediente que ainda não passou
+    if now <= window_start:
+        return window_start
+    step = timedelta(minutes=SLOT_MINUTES)
+    return window_start + -((window_start - now) // step) * step
+
+
+def _next_free(barbers, day, duration, now):
+    """{barber_id: (primeiro horário livre no dia, fuso)} dos barbeiros com horário livre."""
+    windows = {}
+    for barber in barbers:
+        zone = zone_for_barber(barber["_id"])
+        start = local_datetime(day, BUSINESS_HOURS_START, zone)
+        end = local_datetime(day, BUSINESS_HOURS_END, zone)
+        windows[barber["_id"]] = (_first_slot_from(start, now), end, zone)
+
+    # Uma única consulta cobre a janela de todos os barbeiros do lote
+    intervals = booked_intervals_many(
+        list(windows), min(w[0] for w in windows.values()), max(w[1] for w in windows.values())
+    )
+    found = {}
+    for barber_id, (start, end, zone) in windows.items():
+        slots = free_slots(intervals[barber_id], start, end, duration)
+        if slots:
+            found[barber_id] = (slots[0], zone)
+    return found
+
+
+def _search_available(terms, service_id, day, limit, after):
+    # O filtro de horário livre é aplicado em lotes na ordem do nome até completar a página
+    duration = service_duration(service_id)
+    now = utcnow()
+    batch_size = max(limit + 1, 50)
+    results = []
+    while len(results) <= limit:
+        batch = _find(_query(terms, service_id, after), batch_size)
+        if not batch:
+            break
+        free = _next_free(batch, day, duration, now)
+        for barber in batch:
+            if barber["_id"] in free:
+                slot, zone = free[barber["_id"]]
+                results.append({**barber, "next_free_slot": format_local(slot, zone)})
+        if len(batch) < batch_size:
+            break
+        after = (batch[-1].get("name_sort") or "", batch[-1]["_id"])
+    return results
+
+
+def search_barbers(terms=(), service_id=None, day=None, limit=SEARCH_DEFAULT_PAGE_SIZE, after=None, version=None):
+    """Página da busca: (barbeiros, próximo cursor). `version` é a versão atual de "barbers".
+
+    Com `day` ("YYYY-MM-DD"), só barbeiros com horário livre no expediente desse dia,
+    com o primeiro deles em `next_free_slot`. Lança ValueError para um dia inválido.
+    """
+    key = (terms, service_id, day, limit, after, version)
+    cache = availability_cache if day else results_cache
+    page = cache.get(key)
+    if page is not None:
+        return page
+
+    if day:
+        # Valida o dia antes de consultar (local_datetime lança ValueError)
+        local_datetime(day, BUSINESS_HOURS_START)
+        docs = _search_available(terms, service_id, day, limit, after)
+    else:
+        # Um item a mais indica se existe próxima página
+        docs = _find(_query(terms, service_id, after), limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1])
+
+    barbers = []
+    for doc in docs:
+        barber = {"id": doc["_id"], "fullname": doc.get("fullname")}
+        if day:
+            barber["next_free_slot"] = doc["next_free_slot"]
+        barbers.append(barber)
+
+    page = (barbers, next_cursor)
+    cache.set(key, page)
+    return page
@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.archive import merge_sorted
+from app.availability import (
+    BUSINESS_HOURS_END,
+    BUSINESS_HOURS_START,
+    SLOT_MINUTES,
+    booked_intervals_many,
+    claim_slots_many,
+    on_grid,
+    release_slots_many,
+    service_duration,
+)
+from app.database import collection
+from app.catalog import get_barber, get_service
+from app.changefeed import publish
+from app.dates import zone_for_barber
+from app.tasks import after_booking
+from app.versions import bump_appointments
+
+# Tamanho dos lotes de escrita (insert_many) e de leitura do cursor
+IMPORT_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+APPOINTMENT_STATUSES = ("scheduled", "completed", "cancelled")
+EXPORT_FIELDS = ("_id", "user_id", "barber_id", "service_id", "date", "status")
+
+users_collection = collection('users')
+appointments_collection = collection('appointments')
+# Exportações são leituras longas e tolerantes a atraso
+listing_appointments = collection('appointments', read='listing')
+listing_archive = collection('appointments_archive', read='listing')
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _existing_users(user_ids):
+    # Uma consulta $in por lote em vez de um find_one por linha
+    ids = [ObjectId(u) for u in user_ids if ObjectId.is_valid(u)]
+    return {str(u["_id"]) for u in users_collection.find({"_id": {"$in": ids}}, {"_id": 1})}
+
+
+def _validate(row, users, parse_date):
+    if not isinstance(row, dict):
+        return None, "Row must be an object"
+
+    user_id = row.get("user_id")
+    barber_id = row.get("barber_id")
+    service_id = row.get("service_id")
+    date = row.get("date")
+    status = row.get("status", "scheduled")
+
+    if not user_id or not barber_id or not service_id or not date:
+        return None, "User, barber, service, and date are required"
+    if str(user_id) not in users:
+        return None, "User not found"
+    # Barbeiros e serviços vêm do catálogo em cache: nenhuma ida ao banco por linha
+    if not get_barber(barber_id):
+        return None, "Barber not found"
+    if not get_service(service_id):
+        return None, "Service not found"
+    if status not in APPOINTMENT_STATUSES:
+        return None, "Invalid status"
+
+    try:
+        # Horário local no fuso do barbeiro
+        appointment_date = parse_date(date, barber_id)
+    except ValueError:
+        return None, "Invalid date format. Expected format: YYYY-MM-DD HH:MM:SS"
+    # Como em /add: só horários da grade, dentro do expediente
+    if status == "scheduled" and not on_grid(
+        appointment_date, zone_for_barber(barber_id), service_duration(service_id)
+    ):
+        return None, f"Appointments must start on a {SLOT_MINUTES}-minute slot between {BUSINESS_HOURS_START} and {BUSINESS_HOURS_END}"
+
+    return {
+        "_id": ObjectId(),
+        "user_id": ObjectId(user_id),
+        "barber_id": ObjectId(barber_id),
+        "service_id": ObjectId(service_id),
+        "date": appointment_date,
+        "status": status,
+    }, None
+
+
+def _overlapping(docs):
+    """_id dos agendamentos que colidem com agendamentos já gravados (inclusive os sem slots)."""
+    # Uma consulta por dia presente no lote, e não pela faixa inteira de datas da importação
+    by_day = defaultdict(list)
+    for doc in docs:
+        by_day[doc["date"].date()].append(doc)
+
+    overlapping = set()
+    for day_docs in by_day.values():
+        window_start = min(doc["date"] for doc in day_docs)
+        window_end = max(doc["date"] + service_duration(doc["service_id"]) for doc in day_docs)
+        intervals = booked_intervals_many({doc["barber_id"] for doc in day_docs}, window_start, window_end)
+        for doc in day_docs:
+            start = doc["date"]
+            if intervals[doc["barber_id"]].overlaps(start, start + service_duration(doc["service_id"])):
+                overlapping.add(doc["_id"])
+    return overlapping
+
+
+def _book(docs):
+    """Reserva os horários dos agendamentos marcados. Retorna os _id que não puderam ser reservados."""
+    scheduled = [doc for doc in docs if doc["status"] == "scheduled"]
+    if not scheduled:
+        return set()
+    # Mesma ordem de book_appointment: intervalos gravados, depois os slots (que também
+    # barram duas linhas do mesmo lote no mesmo horário)
+    conflicts = _overlapping(scheduled)
+    return conflicts | claim_slots_many([doc for doc in scheduled if doc["_id"] not in conflicts])
+
+
+def _insert(docs):
+    """Grava o lote sem parar no primeiro erro. Retorna {_id: erro} das linhas não gravadas."""
+    try:
+        appointments_collection.insert_many(docs, ordered=False)
+        return {}
+    except BulkWriteError as e:
+        return {docs[error["index"]]["_id"]: "Appointment could not be saved" for error in e.details["writeErrors"]}
+    except PyMongoError:
+        # Nada confirmado: libera os horários reservados para o lote
+        release_slots_many([doc["_id"] for doc in docs])
+        raise
+
+
+def import_appointments(rows, parse_date, chunk_size=IMPORT_CHUNK_SIZE):
+    """Valida e insere agendamentos em lotes. Retorna (inseridos, erros por linha).
+
+    Linhas "scheduled" passam pelas mesmas checagens de horário que /add e reservam seus slots.
+    """
+    inserted = 0
+    errors = []
+    index = 0
+
+    for chunk in _chunks(rows, chunk_size):
+        users = _existing_users({
+            str(row.get("user_id")) for row in chunk if isinstance(row, dict)
+        })
+
+        docs = []
+        rows_by_id = {}
+        for row in chunk:
+            doc, error = _validate(row, users, parse_date)
+            if error:
+                errors.append({"row": index, "msg": error})
+            else:
+                docs.append(doc)
+                rows_by_id[doc["_id"]] = index
+            index += 1
+
+        if not docs:
+            continue
+
+        failed = {_id: "This time slot is not available for this barber" for _id in _book(docs)}
+        docs = [doc for doc in docs if doc["_id"] not in failed]
+        if docs:
+            write_errors = _insert(docs)
+            # Linhas recusadas pelo banco não ficam com slots presos
+            release_slots_many(write_errors)
+            failed.update(write_errors)
+            docs = [doc for doc in docs if doc["_id"] not in write_errors]
+
+        errors.extend({"row": rows_by_id[_id], "msg": msg} for _id, msg in failed.items())
+        if docs:
+            # Efeitos colaterais só para o que de fato foi gravado
+            inserted += len(docs)
+            after_booking(docs)
+            bump_appointments(docs)
+            publish("created", docs)
+
+    errors.sort(key=lambda error: error["row"])
+    return inserted, errors
+
+
+def parse_ndjson(stream):
+    """Lê um agendamento por linha sem carregar o corpo inteiro na memória."""
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Linha inválida vira uma linha rejeitada na validação
+                yield None
+
+
+def _export_row(appointment, format_date):
+    return {
+        "_id": str(appointment["_id"]),
+        "user_id": str(appointment["user_id"]),
+        "barber_id": str(appointment["barber_id"]),
+        "service_id": str(appointment["service_id"]),
+        "date": format_date(appointment["date"], appointment["barber_id"]),
+        "status": appointment["status"],
+    }
+
+
+def export_cursor(query, include_archive=False):
+    def find(collection):
+        return collection.find(
+            query, {field: 1 for field in EXPORT_FIELDS}
+        ).sort([("date", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+
+    if not include_archive:
+        return find(listing_appointments)
+    return merge_sorted([find(listing_appointments), find(listing_archive)])
+
+
+def export_ndjson(cursor, format_date):
+    for appointment in cursor:
+        yield json.dumps(_export_row(appointment, format_date)) + "\n"
+
+
+def export_csv(cursor, format_date):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+
+    writer.writeheader()
+    for appointment in cursor:
+        writer.writerow(_export_row(appointment, format_date))
+        # Envia o que foi escrito e reaproveita o buffer
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
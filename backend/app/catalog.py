@@ -0,0 +1,92 @@
+import os
+from app import versions
+from app.database import collection
+from app.cache import TTLCache
+from app.metrics import register_cache
+
+# Catálogo de serviços e diretório de barbeiros quase nunca mudam:
+# ficam em cache e são invalidados nas escritas
+CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', '300'))
+
+services_cache = TTLCache(maxsize=1, ttl=CACHE_TTL)
+barbers_cache = TTLCache(maxsize=1, ttl=CACHE_TTL)
+register_cache('services', services_cache)
+register_cache('barbers', barbers_cache)
+
+services_collection = collection('services')
+users_collection = collection('users')
+
+
+def _index(docs, version):
+    # Guarda a lista e um índice por ID em uma única entrada do cache
+    return {"list": docs, "by_id": {str(doc["_id"]): doc for doc in docs}, "version": version}
+
+
+def _stale(index, version):
+    # Uma versão conhecida (lida por quem responde com ETag) diferente da carregada
+    # indica escrita em outro worker: recarrega em vez de esperar o TTL
+    return index is None or (version is not None and index["version"] != version)
+
+
+def _services_index(version=None):
+    index = services_cache.get("services")
+    if _stale(index, version):
+        index = _index(list(services_collection.find()), version)
+        services_cache.set("services", index)
+    return index
+
+
+def _barbers_index(version=None):
+    index = barbers_cache.get("barbers")
+    if _stale(index, version):
+        index = _index(list(users_collection.find(
+            {"role": "barber"}, {"fullname": 1, "email": 1, "role": 1, "timezone": 1}
+        )), version)
+        barbers_cache.set("barbers", index)
+    return index
+
+
+def get_services(version=None):
+    """Lista de todos os serviços (documentos compartilhados: não modificar)."""
+    return _services_index(version)["list"]
+
+
+def get_service(service_id):
+    """Serviço pelo ID (str ou ObjectId), ou None se não existir."""
+    return _services_index()["by_id"].get(str(service_id))
+
+
+def get_barbers(version=None):
+    """Lista de todos os barbeiros (documentos compartilhados: não modificar)."""
+    return _barbers_index(version)["list"]
+
+
+def get_barber(barber_id):
+    """Barbeiro pelo ID (str ou ObjectId), ou None se não existir."""
+    return _barbers_index()["by_id"].get(str(barber_id))
+
+
+def sync(services_version, barbers_version):
+    """Recarrega o catálogo se as versões lidas diferirem das carregadas neste processo."""
+    _services_index(services_version)
+    _barbers_index(barbers_version)
+
+
+def refresh():
+    """Lê as versões atuais (uma consulta indexada) e sincroniza o catálogo.
+
+    get_service/get_barber não consultam versões; caminhos que validam ou gravam
+    com base no catálogo chamam esta função antes para ver escritas de outros workers.
+    """
+    current = versions.current(["services", "barbers"])
+    sync(current["services"][0], current["barbers"][0])
+
+
+def invalidate_services():
+    services_cache.invalidate()
+    versions.bump("services")
+
+
+def invalidate_barbers():
+    barbers_cache.invalidate()
+    versions.bump("barbers")
@@ -0,0 +1,250 @@
+# Feed de mudanças de agendamentos (criado/concluído/cancelado) para a agenda dos barbeiros.
+# Com replica set, cada worker lê os eventos de um change stream do MongoDB e recebe as
+# escritas de todos os workers. Sem replica set, cada worker consulta periodicamente as
+# versões (collection_versions) das agendas assinadas e busca o que mudou nelas, também
+# recebendo as escritas dos outros workers. No modo "local" (forçado, ou quando o banco
+# não responde ao hello, ex.: mongomock) as escritas publicam direto no pub/sub em
+# memória e só os assinantes do mesmo processo são avisados.
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from bson import ObjectId
+from flask import current_app
+from pymongo.errors import PyMongoError
+
+from app import versions
+from app.appointment_queries import serialize_barber_appointment
+from app.database import collection, get_db
+from app.dates import as_utc, utcnow
+
+logger = logging.getLogger('barberapp.changefeed')
+
+# "auto" detecta o replica set; "changestream", "poll" ou "local" forçam o modo
+CHANGEFEED_MODE = os.getenv('CHANGEFEED_MODE', 'auto')
+# Eventos pendentes por assinante; acima disso o cliente recebe "resync" e recarrega a agenda
+CHANGEFEED_QUEUE_SIZE = int(os.getenv('CHANGEFEED_QUEUE_SIZE', '100'))
+# Modo "poll": intervalo entre as consultas às versões das agendas assinadas
+CHANGEFEED_POLL_SECONDS = float(os.getenv('CHANGEFEED_POLL_SECONDS', '2'))
+# Folga da janela de busca (relógios dos workers e latência das escritas); repetidos são descartados
+_POLL_MARGIN = timedelta(seconds=5)
+
+EVENT_TYPES = ("created", "completed", "cancelled")
+
+appointments_collection = collection('appointments')
+users_collection = collection('users')
+
+
+class Subscription:
+    def __init__(self, barber_id):
+        self.barber_id = barber_id
+        self.events = queue.Queue(maxsize=CHANGEFEED_QUEUE_SIZE)
+        self.overflowed = False
+
+    def push(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            # Cliente lento: descarta e pede para recarregar em vez de crescer sem limite
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Próximo evento, ("resync", None) após descartes, ou None se o tempo acabar."""
+        if self.overflowed:
+            self.overflowed = False
+            with self.events.mutex:
+                self.events.queue.clear()
+            return ("resync", None)
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeFeed:
+    def __init__(self, app):
+        self.app = app
+        self._subscribers = {}  # barber_id (str) -> set[Subscription]
+        self._lock = threading.Lock()
+        self._mode = None
+        self._pid = None
+        self._watcher = None
+
+    @property
+    def mode(self):
+        # Detectado uma vez por processo, no primeiro uso (nunca na importação)
+        if self._mode is None or self._pid != os.getpid():
+            self._mode = self._detect_mode()
+            self._pid = os.getpid()
+            self._watcher = None
+        return self._mode
+
+    def _detect_mode(self):
+        if CHANGEFEED_MODE != 'auto':
+            return CHANGEFEED_MODE
+        try:
+            hello = get_db().client.admin.command('hello')
+        except Exception:
+            return 'local'
+        # Change streams exigem replica set (setName) ou um mongos
+        return 'changestream' if hello.get('setName') or hello.get('msg') == 'isdbgrid' else 'poll'
+
+    def subscribe(self, barber_id):
+        subscription = Subscription(str(barber_id))
+        with self._lock:
+            self._subscribers.setdefault(subscription.barber_id, set()).add(subscription)
+        if self.mode == 'changestream':
+            self._ensure_watcher(self._watch)
+        elif self.mode == 'poll':
+            self._ensure_watcher(self._poll)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.barber_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.barber_id]
+
+    def publish(self, event_type, appointments):
+        # Nos outros modos o evento chega pelo stream ou pela consulta (inclusive de outros workers)
+        if self.mode != 'local':
+            return
+        for appointment in appointments:
+            self._dispatch(event_type, appointment)
+
+    def _dispatch(self, event_type, appointment):
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(appointment["barber_id"]), ()))
+        if not subscribers:
+            return
+
+        # Serializado uma vez por evento, no mesmo formato da listagem do barbeiro
+        payload = _payload(appointment)
+        for subscription in subscribers:
+            subscription.push((event_type, payload))
+
+    def _ensure_watcher(self, target):
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=target, name='changefeed', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        resume_token = None
+        pipeline = [{"$match": {"$or": [
+            {"operationType": "insert"},
+            {"updateDescription.updatedFields.status": {"$exists": True}},
+        ]}}]
+
+        with self.app.app_context():
+            while True:
+                try:
+                    with appointments_collection.watch(
+                        pipeline, full_document='updateLookup', resume_after=resume_token
+                    ) as stream:
+                        for change in stream:
+                            resume_token = stream.resume_token
+                            event = _event_from_change(change)
+                            if event:
+                                self._dispatch(*event)
+                except PyMongoError:
+                    logger.exception("Change stream interrompido; reconectando")
+                    time.sleep(1)
+
+
+    def _poll(self):
+        known = {}  # barber_id -> versão da agenda já processada
+        seen = {}   # (appointment_id, evento) -> quando pode ser esquecido
+        since = utcnow()
+        with self.app.app_context():
+            while True:
+                time.sleep(CHANGEFEED_POLL_SECONDS)
+                try:
+                    since = self._poll_once(known, seen, since)
+                except PyMongoError:
+                    logger.exception("Falha ao consultar as agendas; tentando de novo")
+
+    def _poll_once(self, known, seen, since):
+        """Envia os eventos das agendas assinadas cuja versão mudou. Retorna o início da próxima janela."""
+        now = utcnow()
+        with self._lock:
+            barber_ids = list(self._subscribers)
+        for barber_id in set(known) - set(barber_ids):
+            del known[barber_id]
+        if not barber_ids:
+            return now
+
+        keys = {versions.barber_appointments_key(barber_id): barber_id for barber_id in barber_ids}
+        current = versions.current(list(keys))
+        changed = [ObjectId(barber_id) for key, barber_id in keys.items() if current[key][0] != known.get(barber_id)]
+
+        if changed:
+            start = since - _POLL_MARGIN
+            appointments = appointments_collection.find({
+                "barber_id": {"$in": changed},
+                "$or": [
+                    {"_id": {"$gte": ObjectId.from_datetime(start)}},
+                    {"completed_at": {"$gte": start}},
+                    {"cancelled_at": {"$gte": start}},
+                ],
+            })
+            for appointment in appointments:
+                event_type = _event_since(appointment, start)
+                if event_type and (appointment["_id"], event_type) not in seen:
+                    seen[(appointment["_id"], event_type)] = now + 3 * _POLL_MARGIN
+                    self._dispatch(event_type, appointment)
+
+        for key, barber_id in keys.items():
+            known[barber_id] = current[key][0]
+        for event, expires in list(seen.items()):
+            if expires < now:
+                del seen[event]
+        return now
+
+
+def _event_since(appointment, start):
+    # Última mudança do agendamento dentro da janela (o cliente substitui pelo _id)
+    status = appointment.get("status")
+    changed_at = appointment.get(f"{status}_at") if status in ("completed", "cancelled") else None
+    if changed_at is not None and as_utc(changed_at) >= start:
+        return status
+    if appointment["_id"].generation_time >= start:
+        return "created"
+    return None
+
+
+def _event_from_change(change):
+    appointment = change.get("fullDocument")
+    if not appointment:
+        return None
+    if change["operationType"] == "insert":
+        return "created", appointment
+    status = change["updateDescription"]["updatedFields"]["status"]
+    return (status, appointment) if status in EVENT_TYPES else None
+
+
+def _payload(appointment):
+    user = users_collection.find_one({"_id": appointment["user_id"]}, {"fullname": 1})
+    return {
+        **serialize_barber_appointment({**appointment, "user": [user] if user else []}),
+        "barber_id": appointment["barber_id"],
+        "user_id": appointment["user_id"],
+    }
+
+
+def init_changefeed(app):
+    app.extensions['changefeed'] = ChangeFeed(app)
+
+
+def get_feed():
+    return current_app.extensions['changefeed']
+
+
+def publish(event_type, appointments):
+    """Publica eventos de agendamentos recém-escritos (documentos com _id, barber_id e user_id)."""
+    get_feed().publish(event_type, appointments)
@@ -0,0 +1,59 @@
+# Compressão das respostas grandes (listagens de agendamentos, catálogo).
+# Respostas acima de COMPRESS_MIN_BYTES são comprimidas com brotli (se instalado e
+# aceito pelo cliente) ou gzip; respostas em streaming (SSE, exportações) ficam de fora.
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Dependência opcional: sem ela, só gzip
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/csv', 'text/plain', 'text/html')
+
+
+def choose_encoding(accept_encodings):
+    """Codificação preferida entre as aceitas pelo cliente ("br", "gzip" ou None)."""
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    # mtime fixo: o mesmo corpo gera sempre os mesmos bytes
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    # O corpo pode variar com Accept-Encoding mesmo quando não é comprimido
+    response.vary.add('Accept-Encoding')
+    if response.content_length is not None and response.content_length < COMPRESS_MIN_BYTES:
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    app.after_request(_compress_response)
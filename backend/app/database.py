@@ -0,0 +1,140 @@
+# Conexão com o MongoDB criada sob demanda, uma por processo.
+# Nada acontece na importação nem em create_app(): o MongoClient só é criado no
+# primeiro acesso ao banco, já dentro do worker (depois do fork do Gunicorn).
+import os
+import threading
+from datetime import timezone
+
+from flask import current_app, g
+from pymongo import MongoClient
+from pymongo.read_preferences import ReadPreference, read_pref_mode_from_name, make_read_preference
+
+from app.metrics import command_listener
+
+
+def client_options(config):
+    """Opções do MongoClient (pool e timeouts) a partir da configuração do app."""
+    return {
+        "maxPoolSize": config['MONGO_MAX_POOL_SIZE'],
+        "minPoolSize": config['MONGO_MIN_POOL_SIZE'],
+        "maxIdleTimeMS": config['MONGO_MAX_IDLE_TIME_MS'],
+        "waitQueueTimeoutMS": config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+        "connectTimeoutMS": config['MONGO_CONNECT_TIMEOUT_MS'],
+        "serverSelectionTimeoutMS": config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        "socketTimeoutMS": config['MONGO_SOCKET_TIMEOUT_MS'],
+        "event_listeners": [command_listener],
+        # Datas lidas do banco já vêm em UTC com fuso (ver app/dates.py)
+        "tz_aware": True,
+        "tzinfo": timezone.utc,
+    }
+
+
+def listing_read_preference(config):
+    """Preferência de leitura das listagens (histórico, exportação, relatórios)."""
+    mode = read_pref_mode_from_name(config['MONGO_LISTING_READ_PREFERENCE'])
+    if mode == ReadPreference.PRIMARY.mode:
+        return ReadPreference.PRIMARY
+    return make_read_preference(mode, None, max_staleness=config['MONGO_MAX_STALENESS_SECONDS'])
+
+
+class Mongo:
+    """Cliente do MongoDB de um app, recriado quando o processo muda (fork)."""
+
+    def __init__(self, app):
+        self.config = app.config
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # Perfis de leitura: escritas, pontos e verificações de conflito usam sempre o primário
+        self.read_preferences = {"primary": None, "listing": listing_read_preference(app.config)}
+
+    @property
+    def client(self):
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    # Um cliente herdado do processo pai não é reaproveitado (sockets compartilhados)
+                    factory = self.config.get('MONGO_CLIENT_FACTORY') or MongoClient
+                    self._client = factory(self.config['MONGO_URI'], **client_options(self.config))
+                    self._pid = pid
+        return self._client
+
+    @property
+    def db(self):
+        # Testes podem injetar um banco pronto (ex.: mongomock) em MONGO_DB
+        if self.config.get('MONGO_DB') is not None:
+            return self.config['MONGO_DB']
+        return self.client[self.config['MONGO_DB_NAME']]
+
+    @property
+    def routes_reads(self):
+        """True se as listagens podem ler de secundários (e então precisam de sessões causais)."""
+        return (self.config.get('MONGO_DB') is None
+                and self.read_preferences["listing"] is not ReadPreference.PRIMARY)
+
+    def collection(self, name, read="primary"):
+        collection = self.db[name]
+        read_preference = self.read_preferences[read]
+        if read_preference is not None:
+            collection = collection.with_options(read_preference=read_preference)
+        return collection
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+
+def init_db(app):
+    app.extensions['mongo'] = Mongo(app)
+    app.teardown_appcontext(_end_session)
+
+
+def get_db():
+    """Banco do app atual (requer contexto de aplicação ou de requisição)."""
+    return current_app.extensions['mongo'].db
+
+
+class LazyCollection:
+    """Coleção resolvida a cada uso no banco do app atual.
+
+    Permite manter as coleções como variáveis de módulo sem tocar no banco
+    na importação; cada acesso usa o cliente do processo e do app correntes.
+    `read` escolhe o perfil de leitura ("primary" ou "listing").
+    """
+
+    def __init__(self, name, read="primary"):
+        self.name = name
+        self.read = read
+
+    def __getattr__(self, attr):
+        return getattr(current_app.extensions['mongo'].collection(self.name, self.read), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r}, read={self.read!r})"
+
+
+def collection(name, read="primary"):
+    return LazyCollection(name, read)
+
+
+def causal_session():
+    """Sessão causalmente consistente da requisição atual (encerrada no fim dela).
+
+    Lida a versão de uma agenda no primário dentro da sessão, uma leitura seguinte
+    no secundário espera a replicação alcançá-la (read-your-writes). Sem leituras
+    roteadas (só primário ou banco injetado em testes), devolve None.
+    """
+    if 'mongo_session' not in g:
+        mongo = current_app.extensions['mongo']
+        g.mongo_session = mongo.client.start_session(causal_consistency=True) if mongo.routes_reads else None
+    return g.mongo_session
+
+
+def _end_session(exc):
+    session = g.pop('mongo_session', None)
+    if session is not None:
+        session.end_session()
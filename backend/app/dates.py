@@ -0,0 +1,120 @@
+# Datas dos agendamentos: gravadas sempre em UTC (datetime com fuso) e convertidas
+# para o fuso IANA da barbearia só na entrada e na saída da API.
+# O fuso padrão é SHOP_TIMEZONE; um barbeiro pode ter o próprio no campo "timezone".
+import os
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from app.catalog import get_barber
+
+SHOP_TIMEZONE = os.getenv('SHOP_TIMEZONE', 'America/Sao_Paulo')
+
+# Formato local devolvido pela API (o mesmo que o frontend envia)
+LOCAL_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Granularidade do cache de deslocamentos: transições de fuso caem em múltiplos de 15 min (UTC)
+_OFFSET_BUCKET = timedelta(minutes=15)
+_EPOCH = datetime(1970, 1, 1)
+
+UTC = timezone.utc
+
+
+@lru_cache(maxsize=None)
+def get_zone(name=None):
+    """Objeto de fuso (carregado uma vez por nome)."""
+    return ZoneInfo(name or SHOP_TIMEZONE)
+
+
+def zone_for_barber(barber_id):
+    # Catálogo em cache: nenhuma ida ao banco
+    barber = get_barber(barber_id) if barber_id is not None else None
+    return get_zone((barber or {}).get("timezone"))
+
+
+def utcnow():
+    return datetime.now(UTC)
+
+
+def as_utc(value):
+    """Datas lidas do banco sem fuso (ex.: clientes sem tz_aware) são UTC."""
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+
+def parse_local(value, zone=None):
+    """ISO-8601 ("YYYY-MM-DD HH:MM:SS", "YYYY-MM-DDTHH:MM", com ou sem fuso) para UTC.
+
+    Sem fuso explícito, o horário é interpretado no fuso `zone` (padrão: o da barbearia).
+    Lança ValueError se o texto não for uma data válida.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid date: {value!r}")
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    # fromisoformat é implementado em C: bem mais rápido que strptime
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=zone or get_zone())
+    return parsed.astimezone(UTC)
+
+
+def parse_for_barber(value, barber_id):
+    return parse_local(value, zone_for_barber(barber_id))
+
+
+class LocalFormatter:
+    """Formata datas UTC no horário local de um fuso, reaproveitando os deslocamentos já calculados."""
+
+    def __init__(self, zone):
+        self.zone = zone
+        self._offsets = {}
+
+    def offset(self, utc):
+        """Deslocamento do fuso em um instante UTC (datetime sem fuso)."""
+        bucket = (utc - _EPOCH) // _OFFSET_BUCKET
+        offset = self._offsets.get(bucket)
+        if offset is None:
+            if len(self._offsets) > 100000:
+                self._offsets.clear()
+            offset = self._offsets[bucket] = self.zone.utcoffset(utc.replace(tzinfo=UTC).astimezone(self.zone))
+        return offset
+
+    def __call__(self, value):
+        # Aritmética direta em vez de astimezone por data; sem fuso, a data já é UTC
+        utc = value.replace(tzinfo=None, microsecond=0)
+        if value.tzinfo is not None:
+            utc -= value.utcoffset()
+        return (utc + self.offset(utc)).isoformat(' ')
+
+    def many(self, values):
+        return [self(value) for value in values]
+
+
+@lru_cache(maxsize=None)
+def formatter(zone=None):
+    """Formatador compartilhado por fuso (o cache de deslocamentos vale para todas as listagens)."""
+    return LocalFormatter(zone or get_zone())
+
+
+def format_local(value, zone=None):
+    return formatter(zone)(value)
+
+
+def format_for_barber(value, barber_id):
+    return formatter(zone_for_barber(barber_id))(value)
+
+
+def local_day(value, zone=None):
+    """Dia local ("YYYY-MM-DD") de uma data UTC."""
+    return format_local(value, zone)[:10]
+
+
+def local_datetime(day, time_of_day, zone=None):
+    """Data UTC de um horário local ("YYYY-MM-DD", "HH:MM")."""
+    return parse_local(f"{day} {time_of_day}", zone)
+
+
+def legacy_to_utc(value, zone=None, legacy_offset=timedelta(hours=-3)):
+    """Converte uma data gravada pela conversão antiga (horário local + legacy_offset, sem fuso)."""
+    local = (value.replace(tzinfo=None) - legacy_offset).replace(tzinfo=zone or get_zone())
+    return local.astimezone(UTC)
@@ -0,0 +1,64 @@
+# GET condicional (ETag/Last-Modified) para listagens consultadas repetidamente pelo frontend.
+# O ETag é derivado das versões das coleções envolvidas e da URL: se nada mudou,
+# a resposta é um 304 sem corpo e sem consultar nem serializar os dados.
+import hashlib
+import os
+from datetime import timedelta
+
+from flask import current_app, request
+
+from app import versions
+from app.dates import as_utc, utcnow
+
+# Segundos em que o navegador pode reutilizar a resposta sem revalidar (0 = sempre revalida)
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', '0'))
+
+
+class Conditional:
+    """Validadores de uma resposta calculados a partir das versões de `keys`."""
+
+    def __init__(self, keys, session=None):
+        # Lidas sempre no primário; com `session`, leituras seguintes na sessão enxergam essas versões
+        self.versions = versions.current(keys, session)
+
+        digest = hashlib.blake2b(digest_size=12)
+        for key in keys:
+            digest.update(f"{key}={self.versions[key][0]};".encode())
+        # A mesma versão gera respostas diferentes para filtros/páginas diferentes
+        digest.update(request.full_path.encode())
+        self.etag = digest.hexdigest()
+
+        modified = [updated_at for _, updated_at in self.versions.values() if updated_at]
+        self.last_modified = max(as_utc(m) for m in modified) if modified else None
+
+    def version(self, key):
+        return self.versions[key][0]
+
+    def recently_modified(self, key):
+        """True se `key` mudou dentro do atraso tolerado nas leituras de secundários."""
+        updated_at = self.versions[key][1]
+        staleness = timedelta(seconds=current_app.config['MONGO_MAX_STALENESS_SECONDS'])
+        return updated_at is not None and as_utc(updated_at) > utcnow() - staleness
+
+    @property
+    def fresh(self):
+        """True se o cliente já tem esta representação (If-None-Match / If-Modified-Since)."""
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+        since = request.if_modified_since
+        return bool(since and self.last_modified and self.last_modified <= since)
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=True)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        # Respostas autenticadas: só o navegador do usuário pode guardá-las
+        if HTTP_CACHE_MAX_AGE > 0:
+            response.headers['Cache-Control'] = f"private, max-age={HTTP_CACHE_MAX_AGE}"
+        else:
+            response.headers['Cache-Control'] = "private, no-cache"
+        response.vary.add('Authorization')
+        return response
+
+    def not_modified(self):
+        return self.apply(current_app.response_class(status=304))
@@ -0,0 +1,147 @@
+import click
+from pymongo import ASCENDING
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+# Chaves das listagens de agendamentos (coleção quente e arquivo), na ordem de
+# _paged_pipeline/_page_match em appointment_queries
+APPOINTMENT_LISTING_KEYS = {
+    owner: [(owner, ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)]
+    for owner in ("barber_id", "user_id")
+}
+
+# Índices obrigatórios por coleção: (nome, chaves, opções)
+REQUIRED_INDEXES = {
+    "users": [
+        ("email_unique", [("email", ASCENDING)], {"unique": True}),
+        ("role", [("role", ASCENDING)], {}),
+        # Busca de barbeiros: prefixo das palavras do nome e ordenação por nome
+        ("role_name_tokens", [("role", ASCENDING), ("name_tokens", ASCENDING)], {}),
+        ("role_name_sort", [("role", ASCENDING), ("name_sort", ASCENDING), ("_id", ASCENDING)], {}),
+    ],
+    "appointments": [
+        # Listagens paginadas: filtro pelo dono e keyset em (date, _id), sem ordenação em memória
+        ("barber_id_date_id", APPOINTMENT_LISTING_KEYS["barber_id"], {}),
+        ("user_id_date_id", APPOINTMENT_LISTING_KEYS["user_id"], {}),
+        # Janela de lembretes (agendamentos marcados por data) e cancelamentos recentes
+        ("status_date", [("status", ASCENDING), ("date", ASCENDING)], {}),
+        ("cancelled_at", [("cancelled_at", ASCENDING)], {"sparse": True}),
+    ],
+    # Mesmas consultas das listagens, só para intervalos antes da fronteira do arquivo
+    "appointments_archive": [
+        ("barber_id_date_id", APPOINTMENT_LISTING_KEYS["barber_id"], {}),
+        ("user_id_date_id", APPOINTMENT_LISTING_KEYS["user_id"], {}),
+    ],
+    "appointment_slots": [
+        ("barber_id_slot_unique", [("barber_id", ASCENDING), ("slot", ASCENDING)], {"unique": True}),
+        ("appointment_id", [("appointment_id", ASCENDING)], {}),
+    ],
+    "daily_rollups": [
+        ("kind_day_ref_unique", [("kind", ASCENDING), ("day", ASCENDING), ("ref", ASCENDING)], {"unique": True}),
+    ],
+    "points_ledger": [
+        ("user_id_created_at", [("user_id", ASCENDING), ("created_at", ASCENDING)], {}),
+        ("appointment_id_reason_unique", [("appointment_id", ASCENDING), ("reason", ASCENDING)], {"unique": True}),
+    ],
+    "revoked_tokens": [
+        ("jti_unique", [("jti", ASCENDING)], {"unique": True}),
+        ("expires_at_ttl", [("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    "jobs": [
+        ("status_run_at", [("status", ASCENDING), ("run_at", ASCENDING)], {}),
+    ],
+    "services": [
+        ("name_unique", [("name", ASCENDING)], {"unique": True}),
+    ],
+}
+
+
+def _key_of(keys):
+    return tuple((field, direction) for field, direction in keys)
+
+
+def _existing_indexes(collection):
+    # Mapeia as chaves de cada índice existente para (nome, unique)
+    existing = {}
+    for info in collection.list_indexes():
+        if info["name"] == "_id_":
+            continue
+        existing[_key_of(info["key"].items())] = (info["name"], bool(info.get("unique")))
+    return existing
+
+
+def check_indexes(db, required=REQUIRED_INDEXES):
+    """Compara os índices do banco com os obrigatórios.
+
+    Retorna um dicionário {"missing": [...], "extra": [...]} com entradas
+    no formato "colecao.nome".
+    """
+    report = {"missing": [], "extra": []}
+
+    for collection_name, specs in required.items():
+        existing = _existing_indexes(db[collection_name])
+        expected = set()
+
+        for name, keys, options in specs:
+            key = _key_of(keys)
+            expected.add(key)
+            found = existing.get(key)
+            # Um índice sem a restrição unique exigida conta como ausente
+            if not found or (options.get("unique") and not found[1]):
+                report["missing"].append(f"{collection_name}.{name}")
+
+        for key, (name, _) in existing.items():
+            if key not in expected:
+                report["extra"].append(f"{collection_name}.{name}")
+
+    return report
+
+
+def ensure_indexes(db, required=REQUIRED_INDEXES):
+    """Cria os índices obrigatórios (idempotente). Retorna os erros encontrados."""
+    errors = []
+
+    for collection_name, specs in required.items():
+        collection = db[collection_name]
+        try:
+            existing = _existing_indexes(collection)
+        except ConnectionFailure as e:
+            # Banco inacessível: as demais coleções falhariam da mesma forma (e esperariam o timeout)
+            errors.append(f"{collection_name}: {e}")
+            break
+        except PyMongoError as e:
+            errors.append(f"{collection_name}: {e}")
+            continue
+
+        for name, keys, options in specs:
+            if _key_of(keys) in existing:
+                continue
+            try:
+                collection.create_index(keys, name=name, **options)
+            except PyMongoError as e:
+                # Ex.: emails duplicados impedem a criação do índice unique
+                errors.append(f"{collection_name}.{name}: {e}")
+
+    return errors
+
+
+def bootstrap_indexes(db, create=True, strict=False):
+    """Cria e verifica os índices (deploy, `flask indexes --bootstrap` ou servidor de desenvolvimento).
+
+    Em modo estrito, retorna False se algum índice obrigatório estiver ausente ou se
+    não foi possível verificá-los (ex.: banco inacessível). Fora dele, só registra o problema.
+    """
+    if create:
+        for error in ensure_indexes(db):
+            click.echo(f"Erro ao criar índice {error}", err=True)
+
+    try:
+        report = check_indexes(db)
+    except PyMongoError as e:
+        click.echo(f"Não foi possível verificar os índices: {e}", err=True)
+        return not strict
+    if report["missing"]:
+        click.echo(f"Índices ausentes: {', '.join(report['missing'])}", err=True)
+    if report["extra"]:
+        click.echo(f"Índices extras: {', '.join(report['extra'])}")
+
+    return not (strict and report["missing"])
@@ -0,0 +1,197 @@
+# Fila de tarefas em segundo plano, persistida no MongoDB.
+# As rotas fazem só a escrita principal e enfileiram os efeitos colaterais (pontos,
+# agregados, lembretes); um executor com pool de threads em cada processo (ou o
+# comando `flask jobs-worker`) consome a fila com lease e novas tentativas.
+#
+# {"name", "payload", "status": "queued" | "running" | "failed", "attempts",
+#  "max_attempts", "run_at", "locked_until", "last_error", "created_at"}
+# Tarefas concluídas são removidas; as que esgotam as tentativas ficam como "failed".
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from flask import current_app
+from pymongo import ReturnDocument
+
+from app.database import collection
+from app.dates import utcnow
+
+logger = logging.getLogger('barberapp.jobs')
+
+# Threads que executam tarefas em cada processo
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '2'))
+# Intervalo máximo entre consultas à fila (enfileirar no mesmo processo acorda na hora)
+JOBS_POLL_SECONDS = float(os.getenv('JOBS_POLL_SECONDS', '1'))
+# Tempo que uma tarefa fica reservada; depois disso outro executor pode retomá-la
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', '60'))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', '5'))
+# Executor dentro dos workers web; use "false" quando houver um `flask jobs-worker` dedicado
+JOBS_RUN_IN_WEB = os.getenv('JOBS_RUN_IN_WEB', 'true').lower() == 'true'
+
+jobs_collection = collection('jobs')
+
+_handlers = {}
+
+
+def job(name):
+    """Registra a função que executa as tarefas `name` (recebe o payload e o ID da tarefa)."""
+    def decorator(fn):
+        _handlers[name] = fn
+        return fn
+    return decorator
+
+
+def _backoff(attempts):
+    # 2, 4, 8, ... segundos, limitado a 5 minutos
+    return timedelta(seconds=min(2 ** attempts, 300))
+
+
+class JobRunner:
+    """Consome a fila em uma thread e executa as tarefas em um pool, uma instância por processo."""
+
+    def __init__(self, app, workers=JOBS_WORKERS):
+        self.app = app
+        self.workers = workers
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def start(self):
+        # Iniciado no primeiro uso em cada processo (depois do fork do Gunicorn)
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._loop, name='jobs', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _loop(self):
+        slots = threading.BoundedSemaphore(self.workers)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job') as pool:
+            while not self._stopping.is_set():
+                # Todas as threads ocupadas: espera uma liberar antes de reservar outra tarefa
+                if not slots.acquire(timeout=JOBS_POLL_SECONDS):
+                    continue
+                self._wakeup.clear()
+                try:
+                    with self.app.app_context():
+                        task = _claim()
+                except Exception:
+                    logger.exception("Erro ao consultar a fila de tarefas")
+                    task = None
+
+                if task is None:
+                    slots.release()
+                    self._wakeup.wait(JOBS_POLL_SECONDS)
+                else:
+                    pool.submit(self._execute, task, slots)
+
+    def run_forever(self):
+        """Executa o laço na thread atual (comando `flask jobs-worker`)."""
+        self._pid = os.getpid()
+        self._loop()
+
+    def _execute(self, task, slots):
+        try:
+            with self.app.app_context():
+                run(task)
+        finally:
+            slots.release()
+
+
+def _claim():
+    now = utcnow()
+    return jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": "queued", "run_at": {"$lte": now}},
+            # Lease vencido: o executor anterior morreu no meio da tarefa
+            {"status": "running", "locked_until": {"$lte": now}},
+        ]},
+        {
+            "$set": {"status": "running", "locked_until": now + timedelta(seconds=JOBS_LEASE_SECONDS)},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def run(task):
+    """Executa uma tarefa reservada e registra o resultado (remoção, nova tentativa ou falha)."""
+    handler = _handlers.get(task["name"])
+    try:
+        if handler is None:
+            raise LookupError(f"Tarefa desconhecida: {task['name']}")
+        handler(task["payload"], task["_id"])
+    except Exception as e:
+        logger.exception("Tarefa %s (%s) falhou", task["name"], task["_id"])
+        if task["attempts"] >= task.get("max_attempts", JOBS_MAX_ATTEMPTS):
+            update = {"status": "failed", "last_error": str(e)}
+        else:
+            update = {
+                "status": "queued",
+                "run_at": utcnow() + _backoff(task["attempts"]),
+                "last_error": str(e),
+            }
+        jobs_collection.update_one({"_id": task["_id"]}, {"$set": update})
+        return False
+
+    jobs_collection.delete_one({"_id": task["_id"]})
+    return True
+
+
+def enqueue(name, payload, run_at=None, max_attempts=JOBS_MAX_ATTEMPTS):
+    """Grava a tarefa na fila e acorda o executor deste processo. Retorna o ID da tarefa."""
+    now = utcnow()
+    result = jobs_collection.insert_one({
+        "name": name,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": run_at or now,
+        "created_at": now,
+    })
+
+    runner = current_app.extensions['jobs']
+    if JOBS_RUN_IN_WEB:
+        runner.start()
+        runner.wake()
+    return result.inserted_id
+
+
+def run_pending(limit=None):
+    """Executa as tarefas vencidas na thread atual (testes e benchmarks). Retorna quantas rodaram."""
+    count = 0
+    while limit is None or count < limit:
+        task = _claim()
+        if task is None:
+            break
+        run(task)
+        count += 1
+    return count
+
+
+def init_jobs(app):
+    from app import reminders, tasks  # noqa: F401 (registra as tarefas)
+
+    app.extensions['jobs'] = JobRunner(app)
+
+    if JOBS_RUN_IN_WEB:
+        # Retoma tarefas pendentes (de outros processos ou de reinícios) sem esperar um enqueue
+        @app.before_request
+        def _start_job_runner():
+            app.extensions['jobs'].start()
@@ -0,0 +1,61 @@
+# Serialização JSON das respostas com suporte nativo aos tipos do MongoDB.
+# As rotas podem devolver ObjectId, datetime e Decimal direto nos dicionários,
+# sem converter campo a campo; com o orjson instalado a codificação é feita em C.
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+from app.dates import as_utc
+
+try:
+    import orjson
+except ImportError:  # Dependência opcional: sem ela, usa o json da biblioteca padrão
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        # Datas sem fuso vindas do banco são UTC
+        return as_utc(value).isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Provider do app: ObjectId vira texto, datetime vira ISO-8601 em UTC e Decimal vira número."""
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        # Argumentos extras (ex.: indent de quem chama json.dumps) só são entendidos pelo json padrão
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options()).decode()
+        kwargs.setdefault("default", _default)
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Bytes direto para o corpo da resposta, sem passar por str
+        body = orjson.dumps(obj, default=_default, option=self._orjson_options(indent)) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app):
+    app.json = FastJSONProvider(app)
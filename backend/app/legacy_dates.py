@@ -0,0 +1,94 @@
+# Correção das datas gravadas pela conversão antiga de horário local para UTC,
+# que subtraía 3 horas em vez de somar (um agendamento das 10h de São Paulo ficava
+# como 07h "UTC" em vez de 13h). Rode uma vez com `flask dates-migrate-legacy --before ...`.
+#
+# A migração é retomável: cada agendamento corrigido recebe legacy_date_fixed
+# ("slots" enquanto os slots ainda não foram refeitos, True no fim).
+#
+# Resgates de pontos não passavam pela conversão: gravavam datetime.now(), e o documento
+# não tem nenhum campo que os distinga. A data é o que os denuncia: /add lia
+# "YYYY-MM-DD HH:MM:SS" (segundos inteiros), enquanto datetime.now() tem milissegundos.
+# Um resgate gravado exatamente em um segundo inteiro (1 em 1000) não é reconhecido;
+# nesse caso, informe o ID em `--exclude`.
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.availability import _slot_keys, service_duration
+from app.database import collection
+from app.dates import legacy_to_utc, zone_for_barber
+
+MIGRATION_BATCH_SIZE = 500
+
+appointments_collection = collection('appointments')
+slots_collection = collection('appointment_slots')
+
+
+def _batches(cursor, size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def is_redemption(appointment):
+    """Agendamento criado por um resgate de pontos antigo (data com fração de segundo)."""
+    return appointment["date"].microsecond != 0
+
+
+def migrate_legacy_dates(before, batch_size=MIGRATION_BATCH_SIZE, exclude=()):
+    """Corrige os agendamentos criados antes de `before` (datetime UTC). Retorna (datas, slots).
+
+    Resgates de pontos (is_redemption) e os IDs em `exclude` ficam de fora.
+    """
+    query = {
+        "_id": {"$lt": ObjectId.from_datetime(before), "$nin": [ObjectId(_id) for _id in exclude]},
+        "legacy_date_fixed": {"$exists": False},
+    }
+
+    # 1ª fase: corrige as datas e remove os slots antigos do lote
+    fixed = 0
+    cursor = appointments_collection.find(query, {"barber_id": 1, "date": 1}).batch_size(batch_size)
+    for batch in _batches(cursor, batch_size):
+        batch = [a for a in batch if not is_redemption(a)]
+        if not batch:
+            continue
+        appointments_collection.bulk_write([
+            UpdateOne(
+                {"_id": a["_id"], "legacy_date_fixed": {"$exists": False}},
+                {"$set": {
+                    "date": legacy_to_utc(a["date"], zone_for_barber(a["barber_id"])),
+                    "legacy_date_fixed": "slots",
+                }},
+            )
+            for a in batch
+        ], ordered=False)
+        slots_collection.delete_many({"appointment_id": {"$in": [a["_id"] for a in batch]}})
+        fixed += len(batch)
+
+    # 2ª fase: com todos os slots antigos removidos, reserva os novos sem conflitos de deslocamento
+    slots = 0
+    cursor = appointments_collection.find(
+        {"legacy_date_fixed": "slots"}, {"barber_id": 1, "service_id": 1, "date": 1, "status": 1}
+    ).batch_size(batch_size)
+    for batch in _batches(cursor, batch_size):
+        docs = [
+            {"barber_id": a["barber_id"], "slot": slot, "appointment_id": a["_id"]}
+            for a in batch if a.get("status") != "cancelled"
+            for slot in _slot_keys(a["date"], service_duration(a["service_id"]))
+        ]
+        if docs:
+            try:
+                slots += len(slots_collection.insert_many(docs, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                # Sobreposições que já existiam nos dados antigos: mantém o primeiro slot
+                slots += e.details["nInserted"]
+        appointments_collection.update_many(
+            {"_id": {"$in": [a["_id"] for a in batch]}}, {"$set": {"legacy_date_fixed": True}}
+        )
+
+    return fixed, slots
@@ -0,0 +1,180 @@
+# Métricas de requisições, do MongoDB e dos caches, expostas em /metrics.
+# Ficam em memória por processo: com vários workers do Gunicorn, cada worker
+# responde com os próprios números.
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+logger = logging.getLogger('barberapp.slow_requests')
+
+# Requisições mais lentas que isso são registradas com as consultas feitas
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '500'))
+
+# Limites (em segundos) dos buckets dos histogramas
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tamanho máximo do resumo de cada consulta no log de requisições lentas
+QUERY_SUMMARY_CHARS = 300
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # o último é o +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_request_latency = defaultdict(Histogram)  # (endpoint, method, status) -> Histogram
+_mongo_latency = defaultdict(Histogram)    # comando -> Histogram
+_mongo_failures = defaultdict(int)         # comando -> falhas
+_caches = {}                               # nome -> TTLCache
+
+# Consultas da requisição em andamento na thread atual (para o log de lentas)
+_local = threading.local()
+
+
+def register_cache(name, cache):
+    """Inclui as estatísticas de um TTLCache nas métricas."""
+    _caches[name] = cache
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Conta e mede os comandos enviados ao MongoDB (passado ao MongoClient)."""
+
+    def started(self, event):
+        queries = getattr(_local, 'queries', None)
+        if queries is not None:
+            command = event.command
+            summary = {
+                key: command[key]
+                for key in ('filter', 'pipeline', 'updates', 'deletes', 'sort', 'limit')
+                if key in command
+            }
+            queries[event.request_id] = {
+                "command": event.command_name,
+                "collection": command.get(event.command_name),
+                "query": str(summary)[:QUERY_SUMMARY_CHARS],
+            }
+
+    def _finished(self, event, failed):
+        seconds = event.duration_micros / 1_000_000
+        with _lock:
+            _mongo_latency[event.command_name].observe(seconds)
+            if failed:
+                _mongo_failures[event.command_name] += 1
+
+        queries = getattr(_local, 'queries', None)
+        if queries is not None and event.request_id in queries:
+            queries[event.request_id]["ms"] = round(seconds * 1000, 2)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+
+command_listener = MongoCommandListener()
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    _local.queries = {}
+
+
+def _after_request(response):
+    started = g.pop('metrics_started', None)
+    queries = getattr(_local, 'queries', None) or {}
+    _local.queries = None
+    if started is None:
+        return response
+
+    elapsed = time.perf_counter() - started
+    # Usa o endpoint (e não a URL) para não criar uma série por ID
+    endpoint = request.endpoint or 'unmatched'
+    with _lock:
+        _request_latency[(endpoint, request.method, str(response.status_code))].observe(elapsed)
+
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        logger.warning(
+            "Requisição lenta: %s %s -> %s em %.1f ms, %d consultas: %s",
+            request.method, request.path, response.status_code,
+            elapsed * 1000, len(queries), list(queries.values()),
+        )
+    return response
+
+
+def _labels(**labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def _render_histogram(lines, name, histogram, labels):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+
+def render_metrics():
+    """Gera as métricas no formato texto do Prometheus."""
+    lines = []
+    with _lock:
+        lines.append("# HELP http_request_duration_seconds Latência das requisições por endpoint.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (endpoint, method, status), histogram in sorted(_request_latency.items()):
+            _render_histogram(lines, "http_request_duration_seconds", histogram,
+                              _labels(endpoint=endpoint, method=method, status=status))
+
+        lines.append("# HELP mongo_command_duration_seconds Duração dos comandos enviados ao MongoDB.")
+        lines.append("# TYPE mongo_command_duration_seconds histogram")
+        for command, histogram in sorted(_mongo_latency.items()):
+            _render_histogram(lines, "mongo_command_duration_seconds", histogram, _labels(command=command))
+
+        lines.append("# HELP mongo_command_failures_total Comandos do MongoDB que falharam.")
+        lines.append("# TYPE mongo_command_failures_total counter")
+        for command, failures in sorted(_mongo_failures.items()):
+            lines.append(f'mongo_command_failures_total{{{_labels(command=command)}}} {failures}')
+
+    for metric, help_text, kind in (
+        ("cache_hits_total", "Acertos do cache.", "counter"),
+        ("cache_misses_total", "Faltas do cache.", "counter"),
+        ("cache_hit_ratio", "Proporção de acertos do cache.", "gauge"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, cache in sorted(_caches.items()):
+            stats = cache.stats()
+            value = {
+                "cache_hits_total": stats["hits"],
+                "cache_misses_total": stats["misses"],
+                "cache_hit_ratio": stats["hit_ratio"],
+            }[metric]
+            lines.append(f'{metric}{{{_labels(cache=name)}}} {value}')
+
+    return "\n".join(lines) + "\n"
+
+
+def init_metrics(app):
+    """Registra os hooks de medição e o endpoint /metrics no app."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
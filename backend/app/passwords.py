@@ -0,0 +1,66 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Método/parâmetros do hash no formato do Werkzeug, ex.: "pbkdf2:sha256:600000" ou "scrypt:32768:8:1"
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+
+# Hashing roda em um pool limitado para não ocupar todas as threads do worker
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+# Máximo de hashes em andamento ou na fila; acima disso a requisição é recusada
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '16'))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE)
+
+_current_prefix = None
+
+
+class PasswordHasherBusy(Exception):
+    """O pool de hashing está cheio."""
+
+
+def _gevent_threadpool():
+    # Com o worker gevent, as threads do ThreadPoolExecutor viram greenlets e o hash
+    # travaria o event loop; usa então o pool de threads nativas do hub do gevent
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return None
+    return get_hub().threadpool if monkey.is_module_patched('threading') else None
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=PASSWORD_HASH_TIMEOUT):
+        raise PasswordHasherBusy()
+    try:
+        threadpool = _gevent_threadpool()
+        if threadpool is not None:
+            return threadpool.spawn(fn, *args).get()
+        return _executor.submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def _method_prefix():
+    # Prefixo gerado pelo método atual (o Werkzeug completa os parâmetros padrão);
+    # calculado no primeiro uso para não custar um hash na inicialização
+    global _current_prefix
+    if _current_prefix is None:
+        _current_prefix = generate_password_hash('', method=PASSWORD_HASH_METHOD).split('$', 1)[0]
+    return _current_prefix
+
+
+def needs_rehash(password_hash):
+    # Hash gerado com outros parâmetros: deve ser refeito no próximo login
+    return password_hash.split('$', 1)[0] != _method_prefix()
@@ -0,0 +1,92 @@
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import collection
+from app.changefeed import publish
+from app.dates import utcnow
+from app.versions import bump_appointments
+
+# Pontos mínimos para resgatar um serviço gratuito
+REDEEM_REQUIRED_POINTS = 100
+
+users_collection = collection('users')
+appointments_collection = collection('appointments')
+# Histórico somente de inserção; o saldo fica em cache no campo "points" do usuário.
+# Créditos nascem com applied=False e só são marcados depois de somados ao saldo
+# (lançamentos sem o campo já estavam aplicados)
+ledger_collection = collection('points_ledger')
+
+
+def record_entry(user_id, delta, reason, appointment_id=None, **fields):
+    """Acrescenta um lançamento ao histórico. Retorna False se ele já existia."""
+    try:
+        ledger_collection.insert_one({
+            "user_id": ObjectId(user_id),
+            "delta": delta,
+            "reason": reason,
+            "appointment_id": appointment_id,
+            "created_at": utcnow(),
+            **fields,
+        })
+        return True
+    except DuplicateKeyError:
+        # O índice unique (appointment_id, reason) impede lançamentos em dobro
+        return False
+
+
+def mark_completed(appointment_id, barber_id):
+    """Marca o agendamento como concluído se ele for do barbeiro e ainda estiver marcado.
+
+    A verificação e a escrita acontecem em uma única operação atômica; retorna
+    o agendamento ou None se a condição não foi satisfeita.
+    """
+    appointment = appointments_collection.find_one_and_update(
+        {
+            "_id": ObjectId(appointment_id),
+            "barber_id": ObjectId(barber_id),
+            # Concluídos e cancelados ficam de fora
+            "status": "scheduled",
+        },
+        {"$set": {"status": "completed", "completed_at": utcnow()}},
+        projection={"user_id": 1, "barber_id": 1, "service_id": 1, "date": 1, "status": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if appointment:
+        bump_appointments([appointment])
+        publish("completed", [appointment])
+    return appointment
+
+
+def credit(user_id, points, reason, appointment_id=None):
+    """Credita pontos uma única vez por (agendamento, motivo), mesmo se repetido após uma falha.
+
+    Cada passo pode ser refeito: o lançamento é único, o $inc só acontece enquanto o
+    lançamento não estiver em `pending_credits` do usuário, e a marca é removida só
+    depois de o lançamento ser marcado como aplicado.
+    """
+    record_entry(user_id, points, reason, appointment_id, applied=False)
+    entry = ledger_collection.find_one({"appointment_id": appointment_id, "reason": reason})
+    if entry.get("applied", True):
+        return
+
+    user_id = ObjectId(user_id)
+    users_collection.update_one(
+        {"_id": user_id, "pending_credits": {"$ne": entry["_id"]}},
+        {"$inc": {"points": entry["delta"]}, "$addToSet": {"pending_credits": entry["_id"]}},
+    )
+    ledger_collection.update_one({"_id": entry["_id"]}, {"$set": {"applied": True}})
+    users_collection.update_one({"_id": user_id}, {"$pull": {"pending_credits": entry["_id"]}})
+
+
+def debit(user_id, points, minimum=REDEEM_REQUIRED_POINTS):
+    """Debita pontos só se o saldo cobrir o valor e o mínimo exigido (operação atômica)."""
+    result = users_collection.update_one(
+        {"_id": ObjectId(user_id), "points": {"$gte": max(points, minimum)}},
+        {"$inc": {"points": -points}},
+    )
+    return result.modified_count == 1
+
+
+def refund(user_id, points):
+    # Devolve um débito cuja operação seguinte falhou (não gera lançamento)
+    users_collection.update_one({"_id": ObjectId(user_id)}, {"$inc": {"points": points}})
@@ -0,0 +1,43 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def parse_rate(rate):
+    """Converte "N/segundos" em (capacidade, reposição por segundo)."""
+    count, seconds = rate.split('/')
+    return int(count), int(count) / float(seconds)
+
+
+class TokenBucketLimiter:
+    """Um token bucket por chave (IP, email...), mantido em memória por processo."""
+
+    def __init__(self, capacity, refill_per_second, max_keys=100000):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # chave -> (tokens, último acesso)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rate(cls, rate, **kwargs):
+        return cls(*parse_rate(rate), **kwargs)
+
+    def allow(self, key):
+        """Consome um token da chave. Retorna (permitido, segundos até o próximo token)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+
+            # Descarta as chaves usadas há mais tempo
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        retry_after = 0 if allowed else (1 - tokens) / self.refill_per_second
+        return allowed, retry_after
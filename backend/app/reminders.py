@@ -0,0 +1,187 @@
+# Lembretes de agendamentos marcados, enviados REMINDER_LEAD_MINUTES antes do horário.
+# O agendador mantém em memória (heap por horário do lembrete) só os agendamentos das
+# próximas REMINDER_HORIZON_HOURS: a janela é carregada uma vez por uma consulta de
+# intervalo em (status, date) e estendida aos poucos; a cada ciclo só entram os
+# agendamentos criados (pelo _id) e cancelados (por cancelled_at) desde o ciclo anterior.
+# Rode com `flask reminders`; o envio passa pela fila de tarefas (novas tentativas).
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from bson import ObjectId
+
+from app.catalog import get_barber, get_service
+from app.database import collection
+from app.dates import as_utc, format_for_barber, utcnow
+from app.jobs import enqueue, job
+
+logger = logging.getLogger('barberapp.reminders')
+
+REMINDER_LEAD_MINUTES = int(os.getenv('REMINDER_LEAD_MINUTES', '60'))
+REMINDER_HORIZON_HOURS = int(os.getenv('REMINDER_HORIZON_HOURS', '24'))
+REMINDER_TICK_SECONDS = float(os.getenv('REMINDER_TICK_SECONDS', '30'))
+# "log" (padrão) ou "file:<caminho>" (uma linha JSON por lembrete)
+REMINDER_NOTIFIER = os.getenv('REMINDER_NOTIFIER', 'log')
+
+# Folga ao buscar agendamentos novos pelo _id (relógios de workers diferentes)
+CLOCK_SKEW = timedelta(seconds=5)
+
+appointments_collection = collection('appointments')
+users_collection = collection('users')
+
+REMINDER_FIELDS = {"user_id": 1, "barber_id": 1, "service_id": 1, "date": 1}
+
+
+class LogNotifier:
+    def send(self, reminder):
+        logger.info("Lembrete: %s", json.dumps(reminder))
+
+
+class FileNotifier:
+    """Acrescenta cada lembrete como uma linha JSON em um arquivo (útil em testes)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminder):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(reminder) + "\n")
+
+
+NOTIFIERS = {
+    "log": lambda arg: LogNotifier(),
+    "file": FileNotifier,
+}
+
+_notifier = None
+
+
+def register_notifier(name, factory):
+    """Registra um notificador: factory recebe o texto após "nome:" em REMINDER_NOTIFIER."""
+    NOTIFIERS[name] = factory
+
+
+def get_notifier():
+    global _notifier
+    if _notifier is None:
+        name, _, arg = REMINDER_NOTIFIER.partition(':')
+        _notifier = NOTIFIERS[name](arg)
+    return _notifier
+
+
+class ReminderScheduler:
+    def __init__(self, lead=timedelta(minutes=REMINDER_LEAD_MINUTES),
+                 horizon=timedelta(hours=REMINDER_HORIZON_HOURS)):
+        self.lead = lead
+        self.horizon = horizon
+        self._heap = []          # (horário do lembrete, _id do agendamento)
+        self._pending = set()    # _ids no heap ainda válidos
+        self._loaded_until = None  # agendamentos com date < isso já foram carregados
+        self._synced_at = None     # último ciclo de busca incremental
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _push(self, appointment):
+        if appointment["_id"] not in self._pending:
+            self._pending.add(appointment["_id"])
+            heapq.heappush(self._heap, (as_utc(appointment["date"]) - self.lead, appointment["_id"]))
+
+    def _extend(self, now):
+        # Estende a janela carregada; cada intervalo de datas é lido uma única vez
+        until = now + self.lead + self.horizon
+        start = self._loaded_until or now
+        if until <= start:
+            return
+        for appointment in appointments_collection.find(
+            {"status": "scheduled", "date": {"$gte": start, "$lt": until},
+             "reminder_sent_at": {"$exists": False}},
+            {"date": 1},
+        ):
+            self._push(appointment)
+        self._loaded_until = until
+
+    def _sync(self, now):
+        if self._synced_at is not None:
+            since = self._synced_at - CLOCK_SKEW
+            # Novos agendamentos: o _id cresce com o horário de criação (usa o índice de _id)
+            for appointment in appointments_collection.find(
+                {"_id": {"$gt": ObjectId.from_datetime(since)}, "status": "scheduled",
+                 "date": {"$gte": now, "$lt": self._loaded_until}},
+                {"date": 1},
+            ):
+                self._push(appointment)
+            # Cancelados: saem do heap (removidos de fato quando chegarem ao topo)
+            for appointment in appointments_collection.find(
+                {"cancelled_at": {"$gte": since}}, {"_id": 1}
+            ):
+                self._pending.discard(appointment["_id"])
+        self._synced_at = now
+
+    def _due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, appointment_id = heapq.heappop(self._heap)
+            if appointment_id in self._pending:
+                self._pending.discard(appointment_id)
+                due.append(appointment_id)
+        return due
+
+    def tick(self, now=None):
+        """Um ciclo: estende a janela, aplica as mudanças e agenda os lembretes vencidos."""
+        now = now or utcnow()
+        self._sync(now)
+        self._extend(now)
+
+        sent = 0
+        for appointment_id in self._due(now):
+            # Marca antes de enviar: outro agendador (ou um reinício) não repete o lembrete,
+            # e um agendamento cancelado nesse meio-tempo não é marcado
+            appointment = appointments_collection.find_one_and_update(
+                {"_id": appointment_id, "status": "scheduled", "reminder_sent_at": {"$exists": False}},
+                {"$set": {"reminder_sent_at": now}},
+                projection=REMINDER_FIELDS,
+            )
+            if appointment:
+                enqueue("send_reminder", _reminder(appointment))
+                sent += 1
+        return sent
+
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    def run_forever(self, tick_seconds=REMINDER_TICK_SECONDS):
+        while True:
+            self.tick()
+            # Acorda no próximo lembrete ou no próximo ciclo, o que vier primeiro
+            wait = tick_seconds
+            next_due = self.next_due()
+            if next_due is not None:
+                wait = min(wait, max(0.0, (next_due - utcnow()).total_seconds()))
+            time.sleep(wait)
+
+
+def _reminder(appointment):
+    user = users_collection.find_one({"_id": appointment["user_id"]}, {"email": 1, "fullname": 1}) or {}
+    barber = get_barber(appointment["barber_id"]) or {}
+    service = get_service(appointment["service_id"]) or {}
+    return {
+        "appointment_id": str(appointment["_id"]),
+        "user_id": str(appointment["user_id"]),
+        "email": user.get("email"),
+        "fullname": user.get("fullname"),
+        "barber": barber.get("fullname"),
+        "service": service.get("name"),
+        # Horário local do barbeiro, como o cliente marcou
+        "date": format_for_barber(appointment["date"], appointment["barber_id"]),
+    }
+
+
+@job("send_reminder")
+def send_reminder(payload, job_id):
+    get_notifier().send(payload)
@@ -0,0 +1,66 @@
+import calendar
+from datetime import date
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from bson import ObjectId
+from app.auth import current_role, role_required
+from app.catalog import get_barber, get_service
+from app.rollups import report
+
+bp = Blueprint('report_routes', __name__, url_prefix='/reports')
+
+
+def _parse_day(value, end_of_month=False):
+    # Aceita "YYYY-MM-DD" ou "YYYY-MM" (primeiro ou último dia do mês)
+    # date() valida mês e dia (ValueError para "2030-02-31")
+    parts = value.split('-')
+    if len(parts) == 2:
+        year, month = int(parts[0]), int(parts[1])
+        day = calendar.monthrange(year, month)[1] if end_of_month else 1
+        return date(year, month, day).isoformat()
+    if len(parts) == 3:
+        year, month, day = (int(p) for p in parts)
+        return date(year, month, day).isoformat()
+    raise ValueError(value)
+
+
+# Rota para o relatório de faturamento e ocupação por barbeiro ou serviço
+@bp.route('', methods=['GET'])
+@role_required('admin', 'barber')
+def get_report():
+    kind = request.args.get('kind', 'barber')
+    if kind not in ('barber', 'service'):
+        return jsonify({"msg": "Kind must be 'barber' or 'service'"}), 400
+
+    if not request.args.get('from') or not request.args.get('to'):
+        return jsonify({"msg": "From and to are required (YYYY-MM or YYYY-MM-DD)"}), 400
+
+    try:
+        day_from = _parse_day(request.args['from'])
+        day_to = _parse_day(request.args['to'], end_of_month=True)
+    except ValueError:
+        return jsonify({"msg": "Invalid date format. Expected format: YYYY-MM or YYYY-MM-DD"}), 400
+    if day_from > day_to:
+        return jsonify({"msg": "From must not be after to"}), 400
+
+    ref = request.args.get('ref')
+    if current_role() == 'barber':
+        # Barbeiros só veem os próprios números
+        if kind != 'barber':
+            return jsonify({"msg": "Access forbidden: Insufficient permissions"}), 403
+        ref = get_jwt_identity()
+    if ref and not ObjectId.is_valid(ref):
+        return jsonify({"msg": "Invalid ref ID"}), 400
+
+    rows = report(kind, day_from, day_to, ObjectId(ref) if ref else None)
+
+    # Nomes vêm do catálogo em cache
+    for row in rows:
+        if kind == 'barber':
+            barber = get_barber(row["ref"])
+            row["name"] = barber["fullname"] if barber else "Unknown"
+        else:
+            service = get_service(row["ref"])
+            row["name"] = service["name"] if service else "Unknown"
+
+    return jsonify({"kind": kind, "from": day_from, "to": day_to, "report": rows}), 200
@@ -0,0 +1,184 @@
+from datetime import datetime
+from itertools import chain
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.database import collection
+from app.availability import BUSINESS_HOURS_END, BUSINESS_HOURS_START
+from app.catalog import get_service
+from app.dates import UTC, local_day, zone_for_barber
+
+# Agregados diários por barbeiro e por serviço, mantidos incrementalmente:
+# {"day": "YYYY-MM-DD", "kind": "barber" | "service", "ref": ObjectId, ...contadores,
+#  "pending_jobs": [IDs das tarefas já somadas à linha e ainda não concluídas]}
+rollups_collection = collection('daily_rollups')
+# Relatórios leem os agregados de secundários quando configurado
+listing_rollups = collection('daily_rollups', read='listing')
+appointments_collection = collection('appointments')
+archive_collection = collection('appointments_archive')
+
+COUNTERS = ("booked_count", "booked_minutes", "completed_count", "revenue")
+
+
+def business_minutes_per_day():
+    start = datetime.strptime(BUSINESS_HOURS_START, "%H:%M")
+    end = datetime.strptime(BUSINESS_HOURS_END, "%H:%M")
+    return int((end - start).total_seconds() // 60)
+
+
+def _day(appointment):
+    # Dia local no fuso do barbeiro (um agendamento às 22h de São Paulo não vira o dia seguinte)
+    return local_day(appointment["date"], zone_for_barber(appointment["barber_id"]))
+
+
+def _apply(entries, token):
+    """Aplica (agendamento, contadores) às linhas do barbeiro e do serviço em um único bulk_write.
+
+    Cada linha recebe o $inc e o `token` em `pending_jobs` na mesma escrita, filtrada pela
+    ausência do token: repetir a aplicação com o mesmo token não soma de novo.
+    Retorna as chaves (dia, tipo, ref) das linhas envolvidas.
+    """
+    merged = {}
+    for appointment, counters in entries:
+        day = _day(appointment)
+        for kind, field in (("barber", "barber_id"), ("service", "service_id")):
+            row = merged.setdefault((day, kind, appointment[field]), {})
+            for counter, value in counters.items():
+                row[counter] = row.get(counter, 0) + value
+
+    if merged:
+        try:
+            rollups_collection.bulk_write([
+                UpdateOne(
+                    {"day": day, "kind": kind, "ref": ref, "pending_jobs": {"$ne": token}},
+                    {"$inc": counters, "$addToSet": {"pending_jobs": token}},
+                    upsert=True,
+                )
+                for (day, kind, ref), counters in merged.items()
+            ], ordered=False)
+        except BulkWriteError as e:
+            # Linha que já tem o token: o filtro não casa e o upsert colide com o índice
+            # único (kind, day, ref). Já aplicada, então só outros erros interessam
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+    return list(merged)
+
+
+def _release(rows, token):
+    # Com os agendamentos já marcados, o token não é mais necessário nas linhas
+    if rows:
+        rollups_collection.bulk_write([
+            UpdateOne({"day": day, "kind": kind, "ref": ref}, {"$pull": {"pending_jobs": token}})
+            for day, kind, ref in rows
+        ], ordered=False)
+
+
+def _event_counters(event, appointment):
+    service = get_service(appointment["service_id"]) or {}
+    if event == "booked":
+        return {"booked_count": 1, "booked_minutes": service.get("duration", 0)}
+    if event == "cancelled":
+        # Desfaz a reserva de um agendamento marcado (cancelados não contam)
+        return {"booked_count": -1, "booked_minutes": -service.get("duration", 0)}
+    return {"completed_count": 1, "revenue": service.get("value", 0)}
+
+
+def record_event(event, appointment_ids, token):
+    """Aplica "booked", "completed" ou "cancelled" aos agregados uma vez por agendamento.
+
+    Roda na fila de tarefas e pode ser repetida com o mesmo `token` (ID da tarefa):
+    cada agendamento é marcado em rollups.<evento> com o token antes da aplicação e
+    com True depois; as linhas dos agregados guardam o token junto com o $inc (_apply),
+    então uma nova tentativa depois de uma falha em qualquer ponto não soma duas vezes.
+    """
+    field = f"rollups.{event}"
+    appointments_collection.update_many(
+        {"_id": {"$in": appointment_ids}, field: {"$exists": False}},
+        {"$set": {field: token}},
+    )
+    appointments = list(appointments_collection.find(
+        {"_id": {"$in": appointment_ids}, field: token},
+        {"barber_id": 1, "service_id": 1, "date": 1},
+    ))
+
+    rows = _apply(((a, _event_counters(event, a)) for a in appointments), token)
+    appointments_collection.update_many(
+        {"_id": {"$in": [a["_id"] for a in appointments]}, field: token},
+        {"$set": {field: True}},
+    )
+    _release(rows, token)
+    return len(appointments)
+
+
+def rebuild_rollups():
+    """Recalcula todos os agregados a partir dos agendamentos (coleção quente e arquivo)."""
+    # O banco agrupa por minuto (UTC)/barbeiro/serviço/status; o dia local é calculado
+    # aqui no fuso de cada barbeiro; duração e valor vêm do catálogo
+    pipeline = [
+        {"$match": {"status": {"$ne": "cancelled"}}},
+        {"$group": {
+            "_id": {
+                "minute": {"$dateToString": {"format": "%Y-%m-%dT%H:%M", "date": "$date"}},
+                "barber_id": "$barber_id",
+                "service_id": "$service_id",
+                "status": "$status",
+            },
+            "count": {"$sum": 1},
+        }},
+    ]
+    groups = chain.from_iterable(
+        c.aggregate(pipeline, allowDiskUse=True) for c in (appointments_collection, archive_collection)
+    )
+
+    totals = {}
+    for group in groups:
+        key = group["_id"]
+        service = get_service(key["service_id"]) or {}
+        date = datetime.fromisoformat(key["minute"]).replace(tzinfo=UTC)
+        day = _day({"date": date, "barber_id": key["barber_id"]})
+        for kind, field in (("barber", "barber_id"), ("service", "service_id")):
+            row = totals.setdefault(
+                (day, kind, key[field]),
+                {counter: 0 for counter in COUNTERS},
+            )
+            row["booked_count"] += group["count"]
+            row["booked_minutes"] += group["count"] * service.get("duration", 0)
+            if key["status"] == "completed":
+                row["completed_count"] += group["count"]
+                row["revenue"] += group["count"] * service.get("value", 0)
+
+    rollups_collection.delete_many({})
+    docs = [
+        {"day": day, "kind": kind, "ref": ref, **counters}
+        for (day, kind, ref), counters in totals.items()
+    ]
+    if docs:
+        rollups_collection.insert_many(docs, ordered=False)
+    return len(docs)
+
+
+def report(kind, day_from, day_to, ref=None):
+    """Soma os agregados diários no intervalo [day_from, day_to] (strings YYYY-MM-DD)."""
+    match = {"kind": kind, "day": {"$gte": day_from, "$lte": day_to}}
+    if ref is not None:
+        match["ref"] = ref
+
+    rows = listing_rollups.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$ref",
+            **{counter: {"$sum": f"${counter}"} for counter in COUNTERS},
+        }},
+        {"$sort": {"revenue": -1}},
+    ])
+
+    days = (datetime.strptime(day_to, "%Y-%m-%d") - datetime.strptime(day_from, "%Y-%m-%d")).days + 1
+    available_minutes = days * business_minutes_per_day()
+
+    results = []
+    for row in rows:
+        result = {"ref": str(row["_id"]), **{counter: row[counter] for counter in COUNTERS}}
+        if kind == "barber" and available_minutes > 0:
+            # Ocupação: minutos agendados sobre os minutos de expediente do período
+            result["occupancy"] = round(100 * row["booked_minutes"] / available_minutes, 2)
+        results.append(result)
+    return results
@@ -1,11 +1,28 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
 from bson import ObjectId
-from app import app
+from pymongo.errors import DuplicateKeyError
+from app.database import collection
+from app.catalog import get_services as get_cached_services, invalidate_services
+from app.http_cache import Conditional
 
 bp = Blueprint('service_routes', __name__, url_prefix='/service')
 
-services_collection = app.db['services']
+services_collection = collection('services')
+
+# Serviços exibidos na listagem
+SERVICE_LIST_LIMIT = 10
+
+
+def serialize_services(services):
+    # ObjectId e Decimal são serializados pelo provider JSON do app
+    return [{
+        "_id": service["_id"],
+        "name": service["name"],
+        "duration": service["duration"],
+        "value": service["value"],
+        "points": service.get("points", 0)  # Incluir pontos ao buscar os serviços
+    } for service in services[:SERVICE_LIST_LIMIT]]
 
 
 @bp.route('/register', methods=['POST'])
@@ -23,12 +40,17 @@ def register_service():
     if duration not in [30, 60]:
         return jsonify({"msg": "Duration must be either 30 or 60 minutes"}), 400
 
-    services_collection.insert_one({
-        "name": name,
-        "duration": duration,
-        "value": value,
-        "points": points  # Adiciona pontos ao serviço
-    })
+    # O índice unique de nome cobre cadastros simultâneos
+    try:
+        services_collection.insert_one({
+            "name": name,
+            "duration": duration,
+            "value": value,
+            "points": points  # Adiciona pontos ao serviço
+        })
+    except DuplicateKeyError:
+        return jsonify({"msg": "Service already exists with this name"}), 409
+    invalidate_services()
     
     return jsonify({"msg": "Service registered successfully!"}), 201
 
@@ -41,6 +63,8 @@ def delete_service(service_id):
     
     if result.deleted_count == 0:
         return jsonify({"msg": "Service not found"}), 404
+
+    invalidate_services()
     
     return jsonify({"msg": "Service deleted successfully!"}), 200
 
@@ -48,19 +72,14 @@ def delete_service(service_id):
 @bp.route('/list', methods=['GET'])
 @jwt_required()
 def get_services():
-    services = services_collection.find().limit(10)
-    
-    services_list = []
-    for service in services:
-        services_list.append({
-            "_id": str(service["_id"]),
-            "name": service["name"],
-            "duration": service["duration"],
-            "value": service["value"],
-            "points": service.get("points", 0)  # Incluir pontos ao buscar os serviços
-        })
-    
-    return jsonify(services=services_list), 200
+    # Nada mudou desde a última consulta do cliente: 304 sem montar a lista
+    cache = Conditional(["services"])
+    if cache.fresh:
+        return cache.not_modified()
+
+    services_list = serialize_services(get_cached_services(cache.version("services")))
+
+    return cache.apply(jsonify(services=services_list)), 200
 
 @bp.route('/register_services', methods=['GET'])
 def register_services():
@@ -82,6 +101,10 @@ def register_services():
     for service in services:
         # Verificar se o serviço já existe
         if not services_collection.find_one({"name": service["name"]}):
-            services_collection.insert_one(service)
+            try:
+                services_collection.insert_one(service)
+            except DuplicateKeyError:
+                pass  # Inserido por uma chamada simultânea
+    invalidate_services()
 
     return jsonify({"msg": "10 Services registered successfully!"}), 200
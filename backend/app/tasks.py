@@ -0,0 +1,53 @@
+# Efeitos colaterais das escritas de agendamentos, executados pela fila de tarefas.
+# As funções after_* são chamadas pelas rotas logo depois da escrita principal.
+from app import points as points_ledger
+from app.catalog import get_service, refresh as refresh_catalog
+from app.database import collection
+from app.jobs import enqueue, job
+from app.rollups import record_event
+
+appointments_collection = collection('appointments')
+
+
+def after_booking(appointments):
+    """Agendamentos criados (um ou um lote da importação)."""
+    # Importados já cancelados não ocupam a agenda (rebuild_rollups também os ignora)
+    ids = [a["_id"] for a in appointments if a.get("status") != "cancelled"]
+    if ids:
+        enqueue("rollups", {"event": "booked", "appointment_ids": ids})
+
+    # Importados já concluídos também contam faturamento (sem gerar pontos)
+    completed = [a["_id"] for a in appointments if a.get("status") == "completed"]
+    if completed:
+        enqueue("rollups", {"event": "completed", "appointment_ids": completed})
+
+
+def after_completion(appointment):
+    enqueue("appointment_completed", {"appointment_id": appointment["_id"]})
+
+
+def after_cancellation(appointment):
+    enqueue("rollups", {"event": "cancelled", "appointment_ids": [appointment["_id"]]})
+
+
+@job("rollups")
+def update_rollups(payload, job_id):
+    record_event(payload["event"], payload["appointment_ids"], job_id)
+
+
+@job("appointment_completed")
+def credit_completion(payload, job_id):
+    appointment = appointments_collection.find_one(
+        {"_id": payload["appointment_id"]}, {"user_id": 1, "service_id": 1}
+    )
+    if not appointment:
+        return
+
+    refresh_catalog()
+    service = get_service(appointment["service_id"])
+    if service:
+        # Pontos baseados no valor do serviço; o histórico garante um crédito por agendamento
+        points_ledger.credit(
+            appointment["user_id"], service.get("value", 0), "appointment_completed", appointment["_id"]
+        )
+    record_event("completed", [appointment["_id"]], job_id)
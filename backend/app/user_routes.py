@@ -1,33 +1,103 @@
-from flask import Blueprint, jsonify, request
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, decode_token
-import datetime
-from app import app
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity, decode_token
+from concurrent.futures import ThreadPoolExecutor
+import math
+import os
+from app.database import causal_session, collection
 from bson import ObjectId 
+from pymongo.errors import DuplicateKeyError
+from app.auth import current_role, revoke_token, role_required
+from app.passwords import PasswordHasherBusy, hash_password, needs_rehash, verify_password
+from app.rate_limit import TokenBucketLimiter
+from app import points as points_ledger
+from app.tasks import after_booking, after_completion
+from app.service_routes import serialize_services
+from app.catalog import get_barber, get_barbers as get_cached_barbers, get_service, get_services, invalidate_barbers, refresh as refresh_catalog, sync as sync_catalog
+from app.archive import ARCHIVE_VERSION_KEY, reaches_archive
+from app.barber_search import parse_search_args, search_barbers, search_fields
+from app.availability import (
+    BUSINESS_HOURS_END,
+    BUSINESS_HOURS_START,
+    SLOT_MINUTES,
+    book_appointment,
+    next_slot_start,
+    on_grid,
+    service_duration,
+)
+from app.dates import parse_local, utcnow, zone_for_barber
+from app.http_cache import Conditional
+from app import versions
+from app.versions import barber_appointments_key, user_appointments_key
+from app.appointment_queries import (
+    barber_appointments,
+    user_appointments,
+    parse_page_args,
+    serialize_barber_appointments,
+    serialize_user_appointments,
+)
 
 bp = Blueprint('user_routes', __name__, url_prefix='/user')
 
 # Referenciar a coleção de usuários do banco de dados
-users_collection = app.db['users']  # Garantir que estamos acessando a coleção correta
-appointments_collection = app.db['appointments']
-services_collection = app.db['services']
+users_collection = collection('users')  # Garantir que estamos acessando a coleção correta
+appointments_collection = collection('appointments')
+# Históricos tolerantes a atraso: lidos de secundários quando configurado
+listing_appointments = collection('appointments', read='listing')
+listing_archive = collection('appointments_archive', read='listing')
+
+
+# Limites de tentativas de login ("N/segundos"), por IP e por email
+login_ip_limiter = TokenBucketLimiter.from_rate(os.getenv('LOGIN_RATE_PER_IP', '20/60'))
+login_email_limiter = TokenBucketLimiter.from_rate(os.getenv('LOGIN_RATE_PER_EMAIL', '5/60'))
+
+# /user/me: campos disponíveis e próximos agendamentos incluídos
+ME_FIELDS = ("role", "fullname", "points", "appointments", "barbers", "services")
+# Campos com a mesma restrição de role da rota equivalente (/user/barbers)
+ME_FIELD_ROLES = {"barbers": ("user",)}
+ME_UPCOMING_LIMIT = int(os.getenv('ME_UPCOMING_LIMIT', '5'))
+# Consultas independentes do /user/me rodam em paralelo (com gevent, viram greenlets)
+_me_executor = ThreadPoolExecutor(max_workers=int(os.getenv('ME_LOOKUP_WORKERS', '4')), thread_name_prefix='me-lookup')
 
 
 from datetime import timedelta
 
 @bp.route('/login', methods=['POST'])
 def login():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"msg": "Email and password required"}), 400
     email = data.get('email')
     password = data.get('password')
 
     if not email or not password:
         return jsonify({"msg": "Email and password required"}), 400
+    if not isinstance(email, str) or not isinstance(password, str):
+        return jsonify({"msg": "Email and password must be strings"}), 400
+
+    # Barra rajadas de tentativas antes de gastar CPU com o hash
+    for limiter, key in ((login_ip_limiter, request.remote_addr), (login_email_limiter, email.lower())):
+        allowed, retry_after = limiter.allow(key)
+        if not allowed:
+            response = jsonify({"msg": "Too many login attempts. Try again later."})
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response, 429
 
     # Busca o usuário no banco de dados
-    user = users_collection.find_one({"email": email})
+    user = users_collection.find_one({"email": email}, {"password": 1, "role": 1})
 
-    if user and check_password_hash(user['password'], password):
+    try:
+        valid_password = bool(user) and verify_password(user['password'], password)
+
+        # Refaz o hash se os parâmetros configurados mudaram
+        if valid_password and needs_rehash(user['password']):
+            users_collection.update_one(
+                {"_id": user['_id']},
+                {"$set": {"password": hash_password(password)}}
+            )
+    except PasswordHasherBusy:
+        return jsonify({"msg": "Server busy, try again shortly"}), 503
+
+    if valid_password:
         # Gera o token JWT com um tempo de expiração
         expires = timedelta(hours=1)
         access_token = create_access_token(
@@ -70,7 +140,10 @@ def register():
         return jsonify({"msg": "User already exists with this email"}), 409
     
     # Hash da senha e inserção no banco de dados
-    hashed_password = generate_password_hash(password)
+    try:
+        hashed_password = hash_password(password)
+    except PasswordHasherBusy:
+        return jsonify({"msg": "Server busy, try again shortly"}), 503
     
     user_data = {
         "email": email,
@@ -82,73 +155,73 @@ def register():
     # Só adiciona "points" para usuários
     if role == 'user':
         user_data["points"] = 0  # Inicializa com 0 pontos para usuários
+
+    if role == 'barber':
+        # Campos da busca por nome e, opcionalmente, os serviços atendidos (padrão: todos)
+        user_data.update(search_fields(fullname))
+        services = data.get('services')
+        if services is not None:
+            refresh_catalog()
+            if not isinstance(services, list) or not all(ObjectId.is_valid(s) and get_service(s) for s in services):
+                return jsonify({"msg": "Invalid services"}), 400
+            user_data["services"] = [ObjectId(s) for s in services]
     
-    # Insere o novo usuário no banco de dados
-    users_collection.insert_one(user_data)
+    # Insere o novo usuário no banco de dados (o índice unique de email cobre cadastros simultâneos)
+    try:
+        users_collection.insert_one(user_data)
+    except DuplicateKeyError:
+        return jsonify({"msg": "User already exists with this email"}), 409
+
+    if role == 'barber':
+        invalidate_barbers()
     
     return jsonify({"msg": "User registered successfully!"}), 201
 
 
 
 @bp.route('/appointments/barber/<barber_id>', methods=['GET'])
-@jwt_required()  # Protege a rota com a necessidade de autenticação
+@role_required('barber', 'user')  # Permitir acesso apenas a barbeiros e usuários
 def get_barber_appointments(barber_id):
-    user_id = get_jwt_identity()  # Pega o ID do usuário autenticado do token
-    
-    # Buscar o usuário no banco de dados
-    user = app.db.users.find_one({"_id": ObjectId(user_id)})
-    
-    if not user:
-        return jsonify({"msg": "User not found"}), 404
-    
-    # Acessar o role do usuário
-    role = user.get('role')
-
-    # Verificar se o usuário tem permissão
-    if role not in ['barber', 'user']:  # Permitir acesso apenas a barbeiros e usuários
-        return jsonify({"msg": "Access forbidden: Insufficient permissions"}), 403
-
     try:
         # Converter barber_id para ObjectId
         barber_object_id = ObjectId(barber_id)
     except:
         return jsonify({"msg": "Invalid barber ID format"}), 400
 
-    # Buscar o barbeiro pelo ID
-    barber = users_collection.find_one({"_id": barber_object_id, "role": "barber"})
+    try:
+        # Filtros from/to no horário local do barbeiro
+        page_args = parse_page_args(request.args, zone_for_barber(barber_object_id))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    # Agenda inalterada desde a última consulta do cliente: 304 sem consultar os agendamentos
+    session = causal_session()
+    cache = Conditional([barber_appointments_key(barber_object_id), "services", "barbers", ARCHIVE_VERSION_KEY], session)
+    if cache.fresh:
+        return cache.not_modified()
+    sync_catalog(cache.version("services"), cache.version("barbers"))
+
+    # Buscar o barbeiro pelo ID (diretório em cache)
+    barber = get_barber(barber_object_id)
     if not barber:
         return jsonify({"msg": "Barber not found"}), 404
 
-    # Buscar os agendamentos do barbeiro específico no banco de dados
-    appointments = appointments_collection.find({"barber_id": barber_object_id})
-
-    appointments_list = []
-    for appointment in appointments:
-        # Buscar o usuário que fez o agendamento (user_id)
-        user = users_collection.find_one({"_id": ObjectId(appointment["user_id"])})
-        user_fullname = user["fullname"] if user else "Unknown User"
-
-        # Buscar o nome do serviço
-        service = services_collection.find_one({"_id": ObjectId(appointment["service_id"])})
-        service_name = service["name"] if service else "Unknown Service"
-        service_value = service["value"] if service else "Unknown Value"
-        service_duration = service["duration"] if service else "Unknown Duration"
-
-        # Adicionando todos os detalhes ao agendamento
-        appointments_list.append({
-            "_id": str(appointment["_id"]),  # Adicionando _id
-            "service_id": str(appointment["service_id"]),
-            "date": appointment["date"].strftime("%Y-%m-%d %H:%M:%S"),
-            "status": appointment["status"],
-            "user_name": user_fullname,  # Nome do usuário que fez o agendamento
-            "service_name": service_name,  # Nome do serviço
-            "service_value": service_value,  # Valor do serviço
-            "service_duration": service_duration
-        })
+    # Buscar os agendamentos do barbeiro já com cliente e serviço em uma única agregação
+    # O arquivo só é consultado quando a página começa antes da fronteira dele
+    archive = listing_archive if reaches_archive(
+        page_args["date_from"], page_args["after"], cache.version(ARCHIVE_VERSION_KEY)
+    ) else None
+    # Agenda alterada há pouco: lê na sessão causal (o secundário espera a replicação da escrita)
+    read_session = session if cache.recently_modified(barber_appointments_key(barber_object_id)) else None
+    appointments, next_cursor = barber_appointments(
+        listing_appointments, barber_object_id, archive=archive, session=read_session, **page_args
+    )
+    appointments_list = serialize_barber_appointments(appointments)
+
     if not appointments_list:
-        return jsonify({"msg": "No appointments found for this barber", "appointments": []}), 200
+        return cache.apply(jsonify({"msg": "No appointments found for this barber", "appointments": [], "next_cursor": None})), 200
 
-    return jsonify(appointments=appointments_list), 200
+    return cache.apply(jsonify(appointments=appointments_list, next_cursor=next_cursor)), 200
 
 
 
@@ -160,10 +233,8 @@ def get_user_appointments(user_id):
 
     # Verificar se o usuário autenticado é o mesmo que está solicitando os agendamentos
     if current_user_id != user_id:
-        # Buscar o usuário no banco para verificar se é um administrador
-        user = users_collection.find_one({"_id": ObjectId(current_user_id)})
-        
-        if not user or user.get('role') != 'admin':  # Permitir apenas admins verem outros agendamentos
+        # Permitir apenas admins verem outros agendamentos (role vem do token)
+        if current_role() != 'admin':
             return jsonify({"msg": "Access forbidden: You can only view your own appointments"}), 403
 
     try:
@@ -172,88 +243,110 @@ def get_user_appointments(user_id):
     except Exception as e:
         return jsonify({"msg": "Invalid user ID format"}), 400
 
-    # Buscar os agendamentos do usuário específico
-    appointments = appointments_collection.find({"user_id": user_id_object})
-    appointments_list = []
-    for appointment in appointments:
-        # Buscar informações do barbeiro
-        barber = users_collection.find_one({"_id": appointment["barber_id"], "role": "barber"})
-        barber_fullname = barber["fullname"] if barber else "Unknown"
-        
-        # Buscar o serviço relacionado ao agendamento
-        service = services_collection.find_one({"_id": appointment["service_id"]})
-        service_name = service["name"] if service else "Unknown"
-        service_duration = service["duration"] if service else "Unknown"
-        service_value = service["value"] if service else "Unknown"
-
-        appointments_list.append({
-            "service_id": str(appointment["service_id"]),  # Converte ObjectId para string
-            "service_name": service_name,
-            "service_duration": service_duration,
-            "service_value": service_value,
-            "barber": barber_fullname,
-            "date": appointment["date"].strftime("%Y-%m-%d %H:%M:%S"),
-            "status": appointment["status"]
-        })
+    try:
+        page_args = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    # Agenda inalterada desde a última consulta do cliente: 304 sem consultar os agendamentos
+    session = causal_session()
+    cache = Conditional([user_appointments_key(user_id_object), "services", "barbers", ARCHIVE_VERSION_KEY], session)
+    if cache.fresh:
+        return cache.not_modified()
+    sync_catalog(cache.version("services"), cache.version("barbers"))
+
+    # Buscar os agendamentos do usuário já com barbeiro e serviço em uma única agregação
+    # O arquivo só é consultado quando a página começa antes da fronteira dele
+    archive = listing_archive if reaches_archive(
+        page_args["date_from"], page_args["after"], cache.version(ARCHIVE_VERSION_KEY)
+    ) else None
+    # Agenda alterada há pouco: lê na sessão causal (o secundário espera a replicação da escrita)
+    read_session = session if cache.recently_modified(user_appointments_key(user_id_object)) else None
+    appointments, next_cursor = user_appointments(
+        listing_appointments, user_id_object, archive=archive, session=read_session, **page_args
+    )
+    appointments_list = serialize_user_appointments(appointments)
     
     if not appointments_list:
-        return jsonify({"msg": "No appointments found for this user", "appointments": []}), 200
+        return cache.apply(jsonify({"msg": "No appointments found for this user", "appointments": [], "next_cursor": None})), 200
+
+    return cache.apply(jsonify(appointments=appointments_list, next_cursor=next_cursor)), 200
+
 
-    return jsonify(appointments=appointments_list), 200
 
+def serialize_barbers(barbers):
+    # Preparar a lista de barbeiros (o _id é serializado pelo provider JSON do app)
+    return [{
+        "id": barber.get("_id"),
+        "fullname": barber.get("fullname"),
+        "email": barber.get("email"),
+        "role": barber.get("role")
+    } for barber in barbers]
 
 
 # Rota para buscar todos os barbeiros
 @bp.route('/barbers', methods=['GET'])
-@jwt_required()
+@role_required('user')  # Apenas usuários comuns podem acessar os barbeiros
 def get_barbers():
-    # Obtém o ID do usuário autenticado do token
-    user_id = get_jwt_identity()
-    
-    # Buscar o usuário no banco de dados
-    user = app.db.users.find_one({"_id": ObjectId(user_id)})
-    
-    if user is None:
-        return jsonify({"msg": "User not found"}), 404
-    
-    # Acessar o role do usuário
-    role = user.get('role')
+    # Diretório inalterado desde a última consulta do cliente: 304 sem montar a lista
+    cache = Conditional(["barbers"])
+    if cache.fresh:
+        return cache.not_modified()
 
-    # Verificar se o usuário tem permissão
-    if role != 'user':  # Apenas usuários comuns podem acessar os barbeiros
-        return jsonify({"msg": "Access forbidden: Insufficient permissions"}), 403
-    
-    # Buscar todos os barbeiros no banco de dados
-    barbers = app.db.users.find({"role": "barber"})
+    # Buscar todos os barbeiros (diretório em cache)
+    barbers = get_cached_barbers(cache.version("barbers"))
     
-    # Preparar a lista de barbeiros
-    barbers_list = []
-    for barber in barbers:
-        barber_data = {
-            "id": str(barber.get("_id")),
-            "fullname": barber.get("fullname"),
-            "email": barber.get("email"),
-            "role": barber.get("role")
-        }
-        barbers_list.append(barber_data)
+    barbers_list = serialize_barbers(barbers)
+
+    return cache.apply(jsonify(barbers=barbers_list)), 200
+
+# Busca paginada no diretório: GET /user/barbers/search?q=jo&service_id=...&date=YYYY-MM-DD
+@bp.route('/barbers/search', methods=['GET'])
+@role_required('user')
+def search_barbers_route():
+    try:
+        args = parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    # Sem filtro de dia o resultado só muda com o diretório: vale o GET condicional
+    cache = Conditional(["barbers", "services"])
+    sync_catalog(cache.version("services"), cache.version("barbers"))
+    if args["service_id"] and not get_service(args["service_id"]):
+        return jsonify({"msg": "Service not found"}), 404
+    if not args["day"] and cache.fresh:
+        return cache.not_modified()
+
+    try:
+        barbers, next_cursor = search_barbers(version=cache.version("barbers"), **args)
+    except ValueError:
+        return jsonify({"msg": "Invalid date format. Expected format: YYYY-MM-DD"}), 400
 
-    return jsonify(barbers=barbers_list), 200
+    response = jsonify(barbers=barbers, next_cursor=next_cursor)
+    return (response if args["day"] else cache.apply(response)), 200
 
 @bp.route('/check_role', methods=['GET'])
 @jwt_required()  # Protege a rota com a necessidade de autenticação
 def check_role():
     user_id = get_jwt_identity()  # Obtém o ID do usuário a partir do token JWT
-    print(f"User ID from token: {user_id}")  # Para depuração
+    current_app.logger.debug(f"User ID from token: {user_id}")  # Para depuração
 
-    # Buscar o usuário no banco de dados usando o ID
-    user = app.db.users.find_one({"_id": ObjectId(user_id)})
-
-    # Verificar se o usuário foi encontrado e se tem o campo 'role'
-    if user and 'role' in user:
-        return jsonify({"role": user['role']}), 200
+    # O role vem da claim do token (o banco só é consultado para tokens sem a claim)
+    role = current_role()
+    if role:
+        return jsonify({"role": role}), 200
     else:
         return jsonify({"msg": "User role not found"}), 400
 
+
+@bp.route('/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    # Revoga o token atual até a sua expiração
+    claims = get_jwt()
+    revoke_token(claims['jti'], claims['exp'])
+    return jsonify({"msg": "Logged out successfully"}), 200
+
 @bp.route('/register_barbers', methods=['GET'])
 def register_barbers():
     barbers = [
@@ -269,13 +362,16 @@ def register_barbers():
         {"email": "anthony.taylor@example.com", "fullname": "Anthony Taylor"}
     ]
 
-    default_password = "password123"
+    # Todos usam a mesma senha padrão: calcula o hash uma única vez
+    default_password = hash_password("password123")
 
     for barber in barbers:
         if not users_collection.find_one({"email": barber["email"]}):
-            barber["password"] = generate_password_hash(default_password)
+            barber["password"] = default_password
             barber["role"] = "barber"  
+            barber.update(search_fields(barber["fullname"]))
             users_collection.insert_one(barber)
+    invalidate_barbers()
 
     return jsonify({"msg": "Barbers registered successfully!"}), 200
 
@@ -289,7 +385,7 @@ def register_barbers():
 @jwt_required()
 def get_points():
     user_id = get_jwt_identity()
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = users_collection.find_one({"_id": ObjectId(user_id)}, {"points": 1})
 
     if not user:
         return jsonify({"msg": "User not found"}), 404
@@ -298,6 +394,85 @@ def get_points():
     return jsonify({"points": points}), 200
 
 
+def _submit(fn, *args):
+    # As coleções precisam do contexto do app também na thread auxiliar
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return fn(*args)
+    return _me_executor.submit(run)
+
+
+def _load_profile(user_id, fields):
+    projection = {field: 1 for field in ("fullname", "points") if field in fields}
+    return users_collection.find_one({"_id": user_id}, projection)
+
+
+def _load_catalog(fields):
+    # Versões lidas do banco: o cache local é recarregado se outro worker alterou o catálogo
+    keys = [key for key in ("barbers", "services") if key in fields]
+    current = versions.current(keys)
+    catalog = {}
+    if "barbers" in current:
+        catalog["barbers"] = serialize_barbers(get_cached_barbers(current["barbers"][0]))
+    if "services" in current:
+        catalog["services"] = serialize_services(get_services(current["services"][0]))
+    return catalog
+
+
+def _load_upcoming(user_id):
+    # Lido do primário: o agendamento recém-criado já aparece na próxima carga da tela
+    appointments, _ = user_appointments(
+        appointments_collection, user_id, limit=ME_UPCOMING_LIMIT, date_from=utcnow(), status="scheduled"
+    )
+    return serialize_user_appointments(appointments)
+
+
+# Dados iniciais das telas em uma única chamada: GET /user/me?fields=role,points
+@bp.route('/me', methods=['GET'])
+@jwt_required()
+def get_me():
+    requested = request.args.get('fields')
+    fields = [f.strip() for f in requested.split(',') if f.strip()] if requested else list(ME_FIELDS)
+    unknown = [f for f in fields if f not in ME_FIELDS]
+    if unknown:
+        return jsonify({"msg": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+    role = current_role()
+    allowed = [f for f in fields if role in ME_FIELD_ROLES.get(f, (role,))]
+    if requested and len(allowed) < len(fields):
+        return jsonify({"msg": "Access forbidden: Insufficient permissions"}), 403
+    # Sem `fields`, os campos não permitidos ao role ficam de fora
+    fields = allowed
+
+    user_id = ObjectId(get_jwt_identity())
+    # Consultas independentes disparadas juntas: o tempo total é o da mais lenta
+    profile = _submit(_load_profile, user_id, fields) if {"fullname", "points"} & set(fields) else None
+    upcoming = _submit(_load_upcoming, user_id) if "appointments" in fields else None
+    catalog = _submit(_load_catalog, fields) if {"barbers", "services"} & set(fields) else None
+
+    result = {}
+    if "role" in fields:
+        # Claim do token: sem consulta ao banco
+        result["role"] = role
+
+    if profile is not None:
+        user = profile.result()
+        if not user:
+            return jsonify({"msg": "User not found"}), 404
+        if "fullname" in fields:
+            result["fullname"] = user.get("fullname")
+        if "points" in fields:
+            result["points"] = user.get("points", 0)
+    if upcoming is not None:
+        result["appointments"] = upcoming.result()
+    if catalog is not None:
+        result.update(catalog.result())
+
+    return jsonify(result), 200
+
+
 from bson import ObjectId
 
 from pymongo.errors import PyMongoError
@@ -315,37 +490,28 @@ def complete_appointment():
     appointment_id = data.get('appointment_id')
     user_id = ObjectId(get_jwt_identity())
 
+    if not ObjectId.is_valid(appointment_id):
+        return jsonify({"msg": "Invalid appointment ID"}), 400
+
     try:
-        # Busca o agendamento no banco de dados
-        appointment = appointments_collection.find_one({"_id": ObjectId(appointment_id)})
-        
-        # Verifica se o agendamento existe
-        if not appointment:
-            return jsonify({"msg": "Appointment not found"}), 404
+        # Verifica (dono e status) e conclui o agendamento em uma única operação atômica
+        appointment = points_ledger.mark_completed(appointment_id, user_id)
 
-        # Verifica se o agendamento já foi completado
-        if appointment['status'] == 'completed':
+        if not appointment:
+            # Caminho de erro: descobre por que o agendamento não pôde ser concluído
+            existing = appointments_collection.find_one(
+                {"_id": ObjectId(appointment_id)}, {"status": 1, "barber_id": 1}
+            )
+            if not existing:
+                return jsonify({"msg": "Appointment not found"}), 404
+            if existing['barber_id'] != user_id:
+                return jsonify({"msg": "You can only complete your own appointments"}), 403
+            if existing['status'] == 'cancelled':
+                return jsonify({"msg": "Cancelled appointments cannot be completed."}), 400
             return jsonify({"msg": "This appointment has already been completed."}), 400
 
-        # Verifica se o barbeiro que está tentando completar o agendamento é o responsável
-        if ObjectId(appointment['barber_id']) != user_id:
-            return jsonify({"msg": "You can only complete your own appointments"}), 403
-
-        # Atualiza o status do agendamento para "completed"
-        appointments_collection.update_one(
-            {"_id": ObjectId(appointment_id)},
-            {"$set": {"status": "completed"}}
-        )
-
-        # Obtém o serviço relacionado ao agendamento
-        service = services_collection.find_one({"_id": appointment['service_id']})
-        
-        if not service:
-            return jsonify({"msg": "Service not found"}), 404
-
-        # Adiciona pontos ao usuário
-        points = service.get('value', 0)  # Pontos baseados no valor do serviço
-        users_collection.update_one({"_id": appointment['user_id']}, {"$inc": {"points": points}})
+        # Pontos e agregados ficam para a fila de tarefas (uma única vez por agendamento)
+        after_completion(appointment)
 
         # Retorna resposta de sucesso
         return jsonify({
@@ -365,7 +531,7 @@ def complete_appointment():
 @jwt_required()
 def redeem_free_service():
     user_id = get_jwt_identity()
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = users_collection.find_one({"_id": ObjectId(user_id)}, {"points": 1})
 
     if not user:
         return jsonify({"msg": "User not found"}), 404
@@ -373,22 +539,20 @@ def redeem_free_service():
     points = user.get("points", 0)
 
     # Definir o número de pontos necessários para um serviço gratuito
-    required_points = 100
+    required_points = points_ledger.REDEEM_REQUIRED_POINTS
 
     if points < required_points:
         return jsonify({"msg": f"You need {required_points} points to redeem a free service"}), 400
 
     # Mostrar os serviços disponíveis para resgatar
-    services = services_collection.find()
-    services_list = []
-
-    for service in services:
-        services_list.append({
-            "_id": str(service["_id"]),
-            "name": service["name"],
-            "duration": service["duration"],
-            "value": service["value"]
-        })
+    refresh_catalog()
+    services = get_services()
+    services_list = [{
+        "_id": service["_id"],
+        "name": service["name"],
+        "duration": service["duration"],
+        "value": service["value"]
+    } for service in services]
 
     return jsonify({"services": services_list}), 200
 
@@ -397,48 +561,65 @@ def redeem_free_service():
 @jwt_required()
 def redeem_free_service_choice(service_id):
     user_id = get_jwt_identity()
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
-
-    if not user:
-        return jsonify({"msg": "User not found"}), 404
-
-    points = user.get("points", 0)
-    required_points = 100  # Definido como 100 pontos para resgatar um serviço
-
-    if points < required_points:
-        return jsonify({"msg": f"You need at least {required_points} points to redeem a service"}), 400
+    required_points = points_ledger.REDEEM_REQUIRED_POINTS  # Pontos mínimos para resgatar um serviço
 
+    refresh_catalog()
     # Verificar se o serviço existe
-    service = services_collection.find_one({"_id": ObjectId(service_id)})
+    service = get_service(service_id)
     if not service:
         return jsonify({"msg": "Service not found"}), 404
 
-    # Verificar se o valor do serviço é inferior ou igual aos pontos do usuário
-    service_value = service.get("value", 0)  # Valor do serviço
-    if service_value > points:
-        return jsonify({"msg": "You don't have enough points for this service"}), 400
-
-    # Subtrair os pontos do usuário, considerando o valor do serviço
-    users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$inc": {"points": -service_value}}
-    )
-
-    # Recuperar o barber_id do corpo da requisição
-    barber_id = request.json.get("barber_id")  # O barber_id vem do corpo da requisição
+    # Recuperar o barber_id do corpo da requisição (validado antes de debitar os pontos)
+    barber_id = (request.get_json(silent=True) or {}).get("barber_id")
 
     if not barber_id:
         return jsonify({"msg": "Barber ID is required"}), 400
 
+    if not get_barber(barber_id):
+        return jsonify({"msg": "Barber not found"}), 404
+
+    # Horário local do barbeiro; sem ele, o próximo slot da grade
+    date = (request.get_json(silent=True) or {}).get("date")
+    zone = zone_for_barber(barber_id)
+    duration = service_duration(service_id)
+    try:
+        appointment_date = parse_local(date, zone) if date else next_slot_start(utcnow(), zone, duration)
+    except ValueError:
+        return jsonify({"msg": "Invalid date format. Expected format: YYYY-MM-DD HH:MM:SS"}), 400
+    if not on_grid(appointment_date, zone, duration):
+        return jsonify({"msg": f"Appointments must start on a {SLOT_MINUTES}-minute slot between {BUSINESS_HOURS_START} and {BUSINESS_HOURS_END}"}), 400
+
+    # Debita os pontos só se o saldo cobrir o serviço e o mínimo (verificação e escrita atômicas)
+    service_value = service.get("value", 0)  # Valor do serviço
+    if not points_ledger.debit(user_id, service_value, required_points):
+        user = users_collection.find_one({"_id": ObjectId(user_id)}, {"points": 1})
+        if not user:
+            return jsonify({"msg": "User not found"}), 404
+        if user.get("points", 0) < required_points:
+            return jsonify({"msg": f"You need at least {required_points} points to redeem a service"}), 400
+        return jsonify({"msg": "You don't have enough points for this service"}), 400
+
     # Criar o agendamento do serviço com o barber_id vindo da requisição
     appointment_data = {
         "user_id": ObjectId(user_id),
         "barber_id": ObjectId(barber_id),  # Usando o barber_id recebido no corpo da requisição
         "service_id": ObjectId(service_id),
-        "date": datetime.now(),  # Usando datetime.now() corretamente agora
+        "date": appointment_date,
         "status": "scheduled"
     }
 
-    appointments_collection.insert_one(appointment_data)
+    # Mesmo caminho do /appointments/add: confere os intervalos e reserva os slots
+    try:
+        appointment_id = book_appointment(appointment_data)
+    except PyMongoError:
+        # Devolve os pontos se o agendamento não pôde ser criado
+        points_ledger.refund(user_id, service_value)
+        raise
+    if not appointment_id:
+        points_ledger.refund(user_id, service_value)
+        return jsonify({"msg": "This time slot is not available for this barber"}), 409
+
+    points_ledger.record_entry(user_id, -service_value, "redeem", appointment_id)
+    after_booking([{"_id": appointment_id, **appointment_data}])
 
     return jsonify({"msg": f"Service redeemed successfully! You used {service_value} points."}), 200
@@ -0,0 +1,48 @@
+# Contadores de versão por coleção (ou por recorte dela), incrementados a cada escrita.
+# São compartilhados entre os workers pelo MongoDB e servem de base para os ETags:
+# {"_id": "services" | "appointments:barber:<id>" | ..., "version": int, "updated_at": datetime}
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from app.database import collection
+
+versions_collection = collection('collection_versions')
+
+
+def barber_appointments_key(barber_id):
+    return f"appointments:barber:{barber_id}"
+
+
+def user_appointments_key(user_id):
+    return f"appointments:user:{user_id}"
+
+
+def bump(*keys):
+    """Incrementa as versões (uma única escrita para várias chaves)."""
+    if not keys:
+        return
+    # Precisão de segundos: é a resolução do cabeçalho Last-Modified
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    versions_collection.bulk_write([
+        UpdateOne({"_id": key}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+        for key in dict.fromkeys(keys)
+    ], ordered=False)
+
+
+def bump_appointments(appointments):
+    # Um agendamento novo ou alterado muda a agenda do barbeiro e a do cliente
+    keys = []
+    for appointment in appointments:
+        keys.append(barber_appointments_key(appointment["barber_id"]))
+        keys.append(user_appointments_key(appointment["user_id"]))
+    bump(*keys)
+
+
+def current(keys, session=None):
+    """Versões atuais: {chave: (versão, updated_at)}; chaves nunca escritas ficam com (0, None)."""
+    found = {
+        doc["_id"]: (doc["version"], doc.get("updated_at"))
+        for doc in versions_collection.find({"_id": {"$in": list(keys)}}, session=session)
+    }
+    return {key: found.get(key, (0, None)) for key in keys}
@@ -0,0 +1,196 @@
+"""Compara os modos de serviço do Gunicorn (gthread x gevent) sob alta concorrência.
+
+Sobe o backend com cada classe de worker usando o mesmo número de processos,
+dispara muitas requisições simultâneas e reporta vazão, latência e memória
+residente (RSS) somada dos processos do Gunicorn.
+
+Requer um mongod local (os workers são processos separados) e Linux (/proc).
+
+Uso (a partir de backend/):
+
+    python -m benchmarks.concurrency --mongo-uri mongodb://localhost:27017 --reset
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.load_test import percentile, reset_and_seed
+
+
+def _children(pid):
+    # Processos filhos diretos (os workers do Gunicorn)
+    children = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return children
+
+
+def _rss_mb(pids):
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            pass
+    return total_kb / 1024
+
+
+def _wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/isServerAlive')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("O servidor não respondeu a tempo")
+
+
+def _drive(port, path, headers, total, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(_):
+        nonlocal errors
+        # Uma conexão keep-alive por thread cliente
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput_rps": total / wall,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+    }
+
+
+def run_worker_class(worker_class, args, path, headers):
+    env = dict(
+        os.environ,
+        WEB_WORKER_CLASS=worker_class,
+        WEB_CONCURRENCY=str(args.workers),
+        WEB_THREADS=str(args.threads),
+        WEB_WORKER_CONNECTIONS=str(args.connections),
+        PORT=str(args.port),
+        MONGO_MAX_POOL_SIZE=str(args.pool_size),
+    )
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(args.port)
+        _drive(args.port, path, headers, min(args.requests, 200), args.concurrency)  # aquecimento
+        result = _drive(args.port, path, headers, args.requests, args.concurrency)
+        result["rss_mb"] = _rss_mb([server.pid] + _children(server.pid))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    return {"worker_class": worker_class, **result}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--reset', action='store_true', help='Apaga o banco barberapp antes de popular.')
+    parser.add_argument('--worker-classes', default='gthread,gevent')
+    parser.add_argument('--workers', type=int, default=2, help='Processos do Gunicorn (fixo entre os modos).')
+    parser.add_argument('--threads', type=int, default=4, help='Threads por worker no modo gthread.')
+    parser.add_argument('--connections', type=int, default=1000, help='Greenlets por worker no modo gevent.')
+    parser.add_argument('--pool-size', type=int, default=100, help='MONGO_MAX_POOL_SIZE por worker.')
+    parser.add_argument('--concurrency', type=int, default=200, help='Requisições simultâneas do cliente.')
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--endpoint', choices=('user_appointments', 'barber_appointments', 'service_list'),
+                        default='user_appointments')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--barbers', type=int, default=20)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--services', type=int, default=10)
+    parser.add_argument('--appointments', type=int, default=20000)
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='Salva os resultados em um arquivo JSON.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark')
+    os.environ.setdefault('SLOW_REQUEST_MS', 'inf')
+    os.environ['MONGO_URI'] = args.mongo_uri
+
+    from app import create_app
+
+    app = create_app()
+    barber_ids, customer_ids, _ = reset_and_seed(app, args)
+    login = app.test_client().post('/user/login', json={
+        "email": "customer0@bench.local", "password": args.password,
+    }).json
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+
+    path = {
+        "user_appointments": f"/user/appointments/user/{login['user_id']}",
+        "barber_appointments": f"/user/appointments/barber/{barber_ids[0]}",
+        "service_list": "/service/list",
+    }[args.endpoint]
+
+    results = [
+        run_worker_class(worker_class, args, path, headers)
+        for worker_class in args.worker_classes.split(',')
+    ]
+
+    print(f"{'worker':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'erros':>8}{'RSS MB':>10}")
+    for r in results:
+        print(f"{r['worker_class']:<10}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['errors']:>8}{r['rss_mb']:>10.1f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""Benchmark de carga da API de agendamentos.
+
+Popula o banco com barbeiros, clientes, serviços e agendamentos e dispara
+requisições concorrentes contra os endpoints principais, reportando
+latência (p50/p95/p99), vazão e operações no MongoDB por requisição.
+
+Uso (a partir de backend/):
+
+    # Offline, com MongoDB em memória (requer: pip install mongomock)
+    python -m benchmarks.load_test --mongomock
+
+    # Contra um mongod local
+    python -m benchmarks.load_test --mongo-uri mongodb://localhost:27017
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Rótulo do endpoint em execução na thread atual, para atribuir as operações no banco
+_current = threading.local()
+_ops = Counter()
+_ops_lock = threading.Lock()
+
+# Métodos de coleção contados quando o banco é o mongomock
+MONGOMOCK_METHODS = (
+    "find", "find_one", "aggregate", "insert_one", "insert_many",
+    "update_one", "update_many", "delete_one", "delete_many",
+    "find_one_and_update", "bulk_write", "count_documents",
+)
+
+
+def _count_op():
+    label = getattr(_current, "label", None)
+    if label:
+        with _ops_lock:
+            _ops[label] += 1
+
+
+def _install_mongomock():
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock não está instalado: pip install mongomock")
+
+    def counted(method):
+        def wrapper(*args, **kwargs):
+            # O mongomock chama find() internamente (ex.: em $lookup): conta só a chamada externa
+            if getattr(_current, "in_op", False):
+                return method(*args, **kwargs)
+            _count_op()
+            _current.in_op = True
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _current.in_op = False
+        return wrapper
+
+    for name in MONGOMOCK_METHODS:
+        setattr(mongomock.collection.Collection, name,
+                counted(getattr(mongomock.collection.Collection, name)))
+
+    return mongomock.MongoClient
+
+
+def _install_command_listener():
+    from pymongo import monitoring
+
+    class OpCounter(monitoring.CommandListener):
+        def started(self, event):
+            _count_op()
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    # Precisa ser registrado antes de o app criar o MongoClient
+    monitoring.register(OpCounter())
+
+
+def percentile(sorted_values, pct):
+    # Percentil pelo método "nearest rank"
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def seed(app, args):
+    """Popula o banco usando as rotas de seed e inserções em lote."""
+    from app.passwords import hash_password
+    from app.catalog import invalidate_barbers, invalidate_services
+    from app.database import get_db
+
+    client = app.test_client()
+    client.get('/service/register_services')
+    client.get('/user/register_barbers')
+
+    db = get_db()
+    password = hash_password(args.password)
+    rng = random.Random(args.seed)
+
+    extra_barbers = max(0, args.barbers - 10)
+    if extra_barbers:
+        db.users.insert_many([
+            {"email": f"barber{i}@bench.local", "fullname": f"Barber {i}",
+             "password": password, "role": "barber"}
+            for i in range(extra_barbers)
+        ])
+
+    extra_services = max(0, args.services - 10)
+    if extra_services:
+        db.services.insert_many([
+            {"name": f"Serviço {i}", "duration": rng.choice([30, 60]),
+             "value": rng.randint(10, 100), "points": rng.randint(1, 20)}
+            for i in range(extra_services)
+        ])
+
+    db.users.insert_many([
+        {"email": f"customer{i}@bench.local", "fullname": f"Customer {i}",
+         "password": password, "role": "user", "points": 0}
+        for i in range(args.customers)
+    ])
+
+    invalidate_barbers()
+    invalidate_services()
+
+    barber_ids = [u["_id"] for u in db.users.find({"role": "barber"}, {"_id": 1})]
+    customer_ids = [u["_id"] for u in db.users.find({"role": "user"}, {"_id": 1})]
+    service_ids = [s["_id"] for s in db.services.find({}, {"_id": 1})]
+
+    # Agendamentos no passado recente, distribuídos entre barbeiros e clientes
+    start = datetime(2024, 1, 1, 9, 0)
+    batch = []
+    for i in range(args.appointments):
+        batch.append({
+            "user_id": rng.choice(customer_ids),
+            "barber_id": rng.choice(barber_ids),
+            "service_id": rng.choice(service_ids),
+            "date": start + timedelta(days=rng.randrange(365), minutes=30 * rng.randrange(18)),
+            "status": rng.choice(["scheduled", "completed"]),
+        })
+        if len(batch) == 1000:
+            db.appointments.insert_many(batch)
+            batch = []
+    if batch:
+        db.appointments.insert_many(batch)
+
+    return barber_ids, customer_ids, service_ids
+
+
+def reset_and_seed(app, args):
+    from app.database import get_db
+    from app.indexes import ensure_indexes
+
+    with app.app_context():
+        db = get_db()
+        # O benchmark apaga o banco: só prossegue em banco vazio ou com --reset
+        if db.users.estimated_document_count() and not args.reset:
+            sys.exit(f"O banco '{db.name}' já tem dados; use --reset para apagá-lo antes do benchmark")
+        db.client.drop_database(db.name)
+        ensure_indexes(db)
+
+        return seed(app, args)
+
+
+def build_scenarios(app, args, barber_ids, customer_ids, service_ids):
+    """Cada cenário é uma função que recebe um test client e um RNG e faz uma requisição."""
+    client = app.test_client()
+
+    # Tokens de alguns clientes, obtidos uma única vez
+    tokens = {}
+    for i in range(min(args.customers, 20)):
+        response = client.post('/user/login', json={
+            "email": f"customer{i}@bench.local", "password": args.password,
+        })
+        tokens[response.json["user_id"]] = response.json["access_token"]
+    users = list(tokens.items())
+
+    def auth(rng):
+        user_id, token = rng.choice(users)
+        return user_id, {"Authorization": f"Bearer {token}"}
+
+    def login(c, rng):
+        i = rng.randrange(args.customers)
+        return c.post('/user/login', json={
+            "email": f"customer{i}@bench.local", "password": args.password,
+        })
+
+    def service_list(c, rng):
+        return c.get('/service/list', headers=auth(rng)[1])
+
+    def appointments_add(c, rng):
+        day = datetime(2027, 1, 1) + timedelta(days=rng.randrange(365))
+        date = day.replace(hour=9) + timedelta(minutes=30 * rng.randrange(18))
+        return c.post('/appointments/add', headers=auth(rng)[1], json={
+            "barber_id": str(rng.choice(barber_ids)),
+            "service_id": str(rng.choice(service_ids)),
+            "date": date.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def barber_appointments(c, rng):
+        barber_id = rng.choice(barber_ids)
+        return c.get(f'/user/appointments/barber/{barber_id}', headers=auth(rng)[1])
+
+    def user_appointments(c, rng):
+        user_id, headers = auth(rng)
+        return c.get(f'/user/appointments/user/{user_id}', headers=headers)
+
+    return {
+        "login": login,
+        "service_list": service_list,
+        "appointments_add": appointments_add,
+        "barber_appointments": barber_appointments,
+        "user_appointments": user_appointments,
+    }
+
+
+def run_scenario(app, name, scenario, args):
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    per_worker = args.requests // args.concurrency
+
+    def worker(worker_id):
+        client = app.test_client()
+        rng = random.Random(args.seed + worker_id)
+        _current.label = name
+        try:
+            for _ in range(per_worker):
+                started = time.perf_counter()
+                response = scenario(client, rng)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[response.status_code] += 1
+        finally:
+            _current.label = None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    total = len(latencies)
+    return {
+        "endpoint": name,
+        "requests": total,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": total / wall if wall else 0.0,
+        "db_ops_per_request": _ops[name] / total if total else 0.0,
+        "statuses": dict(statuses),
+    }
+
+
+def print_report(results):
+    header = f"{'endpoint':<22}{'reqs':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'ops/req':>9}  status"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['endpoint']:<22}{r['requests']:>7}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['throughput_rps']:>10.1f}{r['db_ops_per_request']:>9.2f}  {r['statuses']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--mongomock', action='store_true', help='Usa um MongoDB em memória (mongomock).')
+    target.add_argument('--mongo-uri', default='mongodb://localhost:27017', help='URI de um mongod local.')
+    parser.add_argument('--barbers', type=int, default=20)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--services', type=int, default=10)
+    parser.add_argument('--appointments', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=400, help='Requisições por endpoint.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', default='', help='Lista separada por vírgulas (padrão: todos).')
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--reset', action='store_true', help='Apaga o banco barberapp antes de popular.')
+    parser.add_argument('--seed', type=int, default=42, help='Semente para dados e requisições reprodutíveis.')
+    parser.add_argument('--json', dest='json_path', help='Salva os resultados em um arquivo JSON.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark')
+    # O benchmark mede o custo do login, não o rate limiter
+    os.environ.setdefault('LOGIN_RATE_PER_IP', '1000000/1')
+    os.environ.setdefault('LOGIN_RATE_PER_EMAIL', '1000000/1')
+    os.environ.setdefault('SLOW_REQUEST_MS', 'inf')
+    config = {}
+    if args.mongomock:
+        config['MONGO_URI'] = 'mongodb://localhost:27017'
+        config['MONGO_CLIENT_FACTORY'] = _install_mongomock()
+        # O mongomock não tem sessões nem réplicas: tudo no "primário"
+        config['MONGO_LISTING_READ_PREFERENCE'] = 'primary'
+    else:
+        config['MONGO_URI'] = args.mongo_uri
+        _install_command_listener()
+
+    from app import create_app
+
+    app = create_app(config)
+    barber_ids, customer_ids, service_ids = reset_and_seed(app, args)
+    scenarios = build_scenarios(app, args, barber_ids, customer_ids, service_ids)
+
+    selected = [e for e in args.endpoints.split(',') if e] or list(scenarios)
+    results = [run_scenario(app, name, scenarios[name], args) for name in selected]
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
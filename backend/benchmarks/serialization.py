@@ -0,0 +1,160 @@
+"""Benchmark da serialização e da compressão de uma listagem de agendamentos.
+
+Monta a listagem de um barbeiro com N agendamentos (padrão 5.000) e compara:
+
+- o caminho antigo: conversão campo a campo (str nos ObjectId, strftime nas
+  datas) e json da biblioteca padrão, como o jsonify padrão do Flask;
+- o caminho atual: tipos nativos no dicionário e o provider JSON do app
+  (orjson, se instalado);
+- o tamanho do corpo sem compressão, com gzip e com brotli (se instalado),
+  com os mesmos níveis usados pelo app.
+
+Uso (a partir de backend/; requer: pip install mongomock):
+
+    python -m benchmarks.serialization --appointments 5000
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.load_test import _install_mongomock
+
+
+def _legacy_serialize(appointment, get_service):
+    # Como as rotas faziam antes do provider JSON
+    user = appointment["user"][0] if appointment.get("user") else None
+    service = get_service(appointment["service_id"])
+    return {
+        "_id": str(appointment["_id"]),
+        "service_id": str(appointment["service_id"]),
+        "date": (appointment["date"] - timedelta(hours=3)).strftime("%Y-%m-%d %H:%M:%S"),
+        "status": appointment["status"],
+        "user_name": user["fullname"] if user else "Unknown User",
+        "service_name": service["name"] if service else "Unknown Service",
+        "service_value": service["value"] if service else "Unknown Value",
+        "service_duration": service["duration"] if service else "Unknown Duration",
+    }
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def seed(app, count, rng):
+    from app.database import get_db
+
+    client = app.test_client()
+    client.get('/service/register_services')
+    client.get('/user/register_barbers')
+
+    db = get_db()
+    barber_id = db.users.find_one({"role": "barber"})["_id"]
+    customer_ids = db.users.insert_many([
+        {"email": f"customer{i}@bench.local", "fullname": f"Customer {i}", "role": "user", "points": 0}
+        for i in range(200)
+    ]).inserted_ids
+    service_ids = [s["_id"] for s in db.services.find({}, {"_id": 1})]
+
+    start = datetime(2027, 1, 1, 12, 0)
+    db.appointments.insert_many([
+        {
+            "user_id": rng.choice(customer_ids),
+            "barber_id": barber_id,
+            "service_id": rng.choice(service_ids),
+            "date": start + timedelta(days=i // 18, minutes=30 * (i % 18)),
+            "status": rng.choice(["scheduled", "completed"]),
+        }
+        for i in range(count)
+    ])
+    return barber_id
+
+
+def run(args):
+    from app import compression, create_app, json_provider
+    from app.appointment_queries import barber_appointments, serialize_barber_appointments
+    from app.catalog import get_service
+    from app.database import collection
+
+    app = create_app({
+        'MONGO_URI': 'mongodb://localhost:27017',
+        'MONGO_CLIENT_FACTORY': _install_mongomock(),
+        'MONGO_LISTING_READ_PREFERENCE': 'primary',
+    })
+
+    with app.app_context():
+        barber_id = seed(app, args.appointments, random.Random(args.seed))
+        appointments, _ = barber_appointments(collection('appointments'), barber_id)
+
+        def legacy():
+            rows = [_legacy_serialize(a, get_service) for a in appointments]
+            return json.dumps({"appointments": rows, "next_cursor": None}, sort_keys=True).encode()
+
+        def current():
+            rows = serialize_barber_appointments(appointments)
+            return app.json.response(appointments=rows, next_cursor=None).get_data()
+
+        legacy_time, legacy_body = _best_of(legacy, args.repeat)
+        current_time, current_body = _best_of(current, args.repeat)
+
+    sizes = {"identity": len(current_body)}
+    for encoding in ('gzip', 'br'):
+        if encoding == 'gzip' or compression.brotli is not None:
+            compress_time, body = _best_of(lambda: compression.compress(current_body, encoding), args.repeat)
+            sizes[encoding] = len(body)
+            sizes[f"{encoding}_ms"] = compress_time * 1000
+
+    return {
+        "appointments": len(appointments),
+        "encoder": "orjson" if json_provider.orjson is not None else "json",
+        "legacy_ms": legacy_time * 1000,
+        "current_ms": current_time * 1000,
+        "legacy_bytes": len(legacy_body),
+        "current_bytes": len(current_body),
+        "compressed": sizes,
+    }
+
+
+def print_report(result):
+    print(f"Listagem com {result['appointments']} agendamentos (encoder: {result['encoder']})")
+    print(f"{'':<24}{'ms':>10}{'bytes':>12}")
+    print(f"{'antigo (str/strftime)':<24}{result['legacy_ms']:>10.2f}{result['legacy_bytes']:>12}")
+    print(f"{'atual (provider)':<24}{result['current_ms']:>10.2f}{result['current_bytes']:>12}")
+    print("Corpo da resposta (atual):")
+    sizes = result["compressed"]
+    for encoding in ("identity", "gzip", "br"):
+        if encoding in sizes:
+            elapsed = f", {sizes[encoding + '_ms']:.2f} ms" if encoding != "identity" else ""
+            print(f"  {encoding:<10}{sizes[encoding]:>12} bytes ({sizes[encoding] / sizes['identity']:.1%}{elapsed})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--appointments', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições (vale a melhor).')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='Salva os resultados em um arquivo JSON.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark')
+    os.environ.setdefault('SLOW_REQUEST_MS', 'inf')
+
+    result = run(args)
+    print_report(result)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Configuração do Gunicorn para produção: gunicorn -c gunicorn.conf.py 'app:create_app()'
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+
+from gunicorn.glogging import Logger
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Um processo por núcleo (mais um) e threads para esperar o MongoDB sem travar o worker
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', '4'))
+
+# "gthread" (padrão) ou "gevent": no modo gevent cada requisição roda em uma greenlet,
+# então um worker atende centenas de requisições esperando o MongoDB com a mesma memória
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', '1000'))
+
+# Cada worker cria o app e abre o seu próprio MongoClient no primeiro acesso ao banco
+# (um cliente criado no processo mestre não pode ser compartilhado entre processos)
+preload_app = False
+
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+
+# Recicla workers periodicamente para conter vazamentos de memória
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '100'))
+
+accesslog = '-'
+errorlog = '-'
+
+# O stream SSE recebe o token na query string (?jwt=...): nunca vai para o log de acesso
+_TOKEN_PARAM = re.compile(r'((?:^|[?&])jwt=)[^&\s"]*')
+
+
+class RedactingLogger(Logger):
+    def atoms(self, resp, req, environ, request_time):
+        atoms = super().atoms(resp, req, environ, request_time)
+        return {
+            key: _TOKEN_PARAM.sub(r'\1[redacted]', value) if isinstance(value, str) else value
+            for key, value in atoms.items()
+        }
+
+
+logger_class = RedactingLogger
+
+
+def on_starting(server):
+    # Índices são criados/verificados uma vez, antes dos workers, em um processo à parte:
+    # o mestre não importa o app nem abre conexões que seriam herdadas no fork
+    create = os.getenv('MONGO_CREATE_INDEXES', 'true').lower() == 'true'
+    strict = os.getenv('MONGO_INDEXES_STRICT', 'false').lower() == 'true'
+    if not create and not strict:
+        return
+
+    # O subprocesso informa a causa de uma falha (índice ausente, banco inacessível) no stderr
+    result = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app:create_app()', 'indexes', '--bootstrap'])
+    if result.returncode == 0:
+        return
+    if strict:
+        raise SystemExit(f"Verificação dos índices falhou (código {result.returncode}) com MONGO_INDEXES_STRICT ativo")
+    server.log.warning("Verificação dos índices falhou (código %s); iniciando mesmo assim", result.returncode)
+
+
+def worker_exit(server, worker):
+    # Fecha as conexões do pool do MongoDB ao encerrar o worker
+    mongo = getattr(worker.wsgi, 'extensions', {}).get('mongo')
+    if mongo is not None:
+        mongo.close()
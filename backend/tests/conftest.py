@@ -0,0 +1,71 @@
+# Testes com um banco em memória (mongomock): pip install pytest mongomock
+# Rodar a partir de backend/: python -m pytest tests
+import os
+from datetime import timezone
+
+import pytest
+
+# As tarefas rodam na thread do teste (run_pending), sem o executor em segundo plano
+os.environ.setdefault('JOBS_RUN_IN_WEB', 'false')
+
+try:
+    import mongomock
+except ImportError:
+    # Sem mongomock não há banco para os testes: nada é coletado
+    collect_ignore_glob = ["test_*.py"]
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.metrics import _caches  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient(tz_aware=True, tzinfo=timezone.utc).db
+
+
+@pytest.fixture
+def app(db):
+    # Caches de processo (catálogo, usuários, busca) não podem vazar entre bancos
+    for cache in _caches.values():
+        cache.invalidate()
+    app = create_app({'JWT_SECRET_KEY': 'test', 'MONGO_DB': db, 'TESTING': True})
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(app):
+    """Cabeçalho Authorization para um usuário e papel."""
+    def headers(user_id, role):
+        token = create_access_token(identity=str(user_id), additional_claims={"role": role})
+        return {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+@pytest.fixture
+def catalog(client, db):
+    """Serviços e barbeiros padrão, com o índice único de slots que o bootstrap criaria."""
+    client.get('/service/register_services')
+    client.get('/user/register_barbers')
+    db.appointment_slots.create_index([("barber_id", 1), ("slot", 1)], unique=True)
+    return {
+        "services": list(db.services.find()),
+        "barbers": list(db.users.find({"role": "barber"})),
+    }
+
+
+@pytest.fixture
+def customer(db):
+    return db.users.insert_one({"email": "cliente@example.com", "fullname": "Cliente", "role": "user"}).inserted_id
+
+
+@pytest.fixture
+def admin(db):
+    return db.users.insert_one({"email": "admin@example.com", "fullname": "Admin", "role": "admin"}).inserted_id
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.availability import next_slot_start, on_grid
+from app.dates import UTC, get_zone
+
+# Horários no fuso da barbearia (America/Sao_Paulo, sem horário de verão)
+ZONE = get_zone()
+HALF_HOUR = timedelta(minutes=30)
+HOUR = timedelta(minutes=60)
+
+
+def local(day, hour, minute=0):
+    return datetime(2026, 10, day, hour, minute, tzinfo=ZONE).astimezone(UTC)
+
+
+@pytest.mark.parametrize("now, expected", [
+    (local(18, 4, 30), local(18, 9)),        # madrugada: abertura do dia
+    (local(18, 9), local(18, 9)),
+    (local(18, 10, 5), local(18, 10, 30)),
+    (local(18, 17, 10), local(18, 17, 30)),
+    (local(18, 17, 40), local(19, 9)),       # último horário já passou
+    (local(18, 23, 10), local(19, 9)),       # noite: abertura do dia seguinte
+])
+def test_next_slot_start_stays_in_business_hours(now, expected):
+    assert next_slot_start(now, ZONE, HALF_HOUR) == expected
+
+
+def test_next_slot_start_needs_room_for_the_service():
+    assert next_slot_start(local(18, 17, 10), ZONE, HOUR) == local(19, 9)
+
+
+@pytest.mark.parametrize("start, duration, expected", [
+    (local(18, 9), HALF_HOUR, True),
+    (local(18, 17, 30), HALF_HOUR, True),
+    (local(18, 10, 15), HALF_HOUR, False),   # fora da grade
+    (local(18, 7, 30), HALF_HOUR, False),    # antes da abertura
+    (local(18, 23, 30), HALF_HOUR, False),   # depois do fechamento
+    (local(18, 17, 30), HOUR, False),        # terminaria depois do fechamento
+])
+def test_on_grid(start, duration, expected):
+    assert on_grid(start, ZONE, duration) is expected
+
+
+@pytest.mark.parametrize("now, expected", [
+    (local(18, 4, 30), "2026-10-18 09:00:00"),
+    (local(18, 23, 10), "2026-10-19 09:00:00"),
+])
+def test_redeem_without_date_books_within_business_hours(monkeypatch, client, db, auth, catalog, now, expected):
+    import app.user_routes as user_routes
+    monkeypatch.setattr(user_routes, "utcnow", lambda: now)
+    user = db.users.insert_one({"email": "u@example.com", "fullname": "U", "role": "user", "points": 1000}).inserted_id
+    service = next(s for s in catalog["services"] if s["duration"] == 30)
+    barber = catalog["barbers"][0]
+
+    response = client.post(
+        f'/user/redeem_free_service/{service["_id"]}',
+        json={"barber_id": str(barber["_id"])},
+        headers=auth(user, "user"),
+    )
+
+    assert response.status_code == 200
+    appointment = db.appointments.find_one({"user_id": user})
+    assert appointment["date"].astimezone(ZONE).strftime("%Y-%m-%d %H:%M:%S") == expected
+
+
+@pytest.mark.parametrize("date", ["2030-01-02 07:30:00", "2030-01-02 23:30:00", "2030-01-02 10:15:00"])
+def test_add_rejects_times_outside_the_grid(client, auth, catalog, customer, date):
+    response = client.post('/appointments/add', json={
+        "barber_id": str(catalog["barbers"][0]["_id"]),
+        "service_id": str(catalog["services"][0]["_id"]),
+        "date": date,
+    }, headers=auth(customer, "user"))
+
+    assert response.status_code == 400
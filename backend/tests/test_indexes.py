@@ -0,0 +1,75 @@
+import importlib.util
+import os
+import subprocess
+from types import SimpleNamespace
+from unittest import mock
+
+import mongomock
+import pytest
+from pymongo.collection import Collection
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.indexes import REQUIRED_INDEXES, bootstrap_indexes, check_indexes, ensure_indexes
+
+
+def _keys(collection, name):
+    return next(keys for index_name, keys, _ in REQUIRED_INDEXES[collection] if index_name == name)
+
+
+def test_listing_indexes_cover_the_keyset_sort():
+    # _paged_pipeline ordena por (date, _id) depois de filtrar pelo barbeiro ou cliente
+    for collection in ("appointments", "appointments_archive"):
+        assert _keys(collection, "barber_id_date_id") == [("barber_id", 1), ("date", 1), ("_id", 1)]
+        assert _keys(collection, "user_id_date_id") == [("user_id", 1), ("date", 1), ("_id", 1)]
+
+
+def test_ensure_indexes_creates_every_required_index(db):
+    assert ensure_indexes(db) == []
+    assert check_indexes(db)["missing"] == []
+
+
+def test_replaced_listing_index_is_reported_as_extra(db):
+    db.appointments.create_index([("barber_id", 1), ("date", 1)], name="barber_id_date")
+
+    assert ensure_indexes(db) == []
+    assert "appointments.barber_id_date" in check_indexes(db)["extra"]
+
+
+def _unreachable(monkeypatch):
+    def fail(self, *args, **kwargs):
+        raise ServerSelectionTimeoutError("localhost:27017: Connection refused")
+    for cls in (Collection, mongomock.Collection):
+        monkeypatch.setattr(cls, "list_indexes", fail)
+
+
+def test_unreachable_database_is_reported_not_raised(monkeypatch, db, capsys):
+    _unreachable(monkeypatch)
+
+    errors = ensure_indexes(db)
+    assert len(errors) == 1 and "Connection refused" in errors[0]
+
+    assert bootstrap_indexes(db, strict=False) is True
+    assert bootstrap_indexes(db, strict=True) is False
+    assert "Connection refused" in capsys.readouterr().err
+
+
+def _gunicorn_config():
+    path = os.path.join(os.path.dirname(__file__), os.pardir, "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_on_starting_only_aborts_in_strict_mode(monkeypatch):
+    config = _gunicorn_config()
+    monkeypatch.setattr(subprocess, "run", lambda *args, **kwargs: SimpleNamespace(returncode=1))
+    server = SimpleNamespace(log=mock.Mock())
+
+    monkeypatch.setenv("MONGO_INDEXES_STRICT", "false")
+    config.on_starting(server)
+    server.log.warning.assert_called_once()
+
+    monkeypatch.setenv("MONGO_INDEXES_STRICT", "true")
+    with pytest.raises(SystemExit, match="código 1"):
+        config.on_starting(server)
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.dates import UTC
+from app.legacy_dates import migrate_legacy_dates
+
+
+def _legacy(db, catalog, customer, date):
+    # Documento como a versão antiga gravava: sem slots, sem histórico de pontos
+    return db.appointments.insert_one({
+        "user_id": customer,
+        "barber_id": catalog["barbers"][0]["_id"],
+        "service_id": catalog["services"][0]["_id"],
+        "date": date,
+        "status": "scheduled",
+    }).inserted_id
+
+
+def test_migration_shifts_bookings_but_not_redemptions(db, catalog, customer):
+    # /add: 10h de São Paulo gravadas como 07h (3 horas a menos, segundos inteiros)
+    booking = _legacy(db, catalog, customer, datetime(2024, 11, 18, 7, 0))
+    # Resgate: datetime.now() no momento do pedido, com milissegundos
+    redemption = _legacy(db, catalog, customer, datetime(2024, 11, 18, 14, 27, 3, 512000))
+
+    fixed, _ = migrate_legacy_dates(datetime.now(UTC) + timedelta(minutes=1))
+
+    assert fixed == 1
+    assert db.appointments.find_one({"_id": booking})["date"] == datetime(2024, 11, 18, 13, 0, tzinfo=UTC)
+    assert db.appointments.find_one({"_id": redemption})["date"] == datetime(2024, 11, 18, 14, 27, 3, 512000, tzinfo=UTC)
+
+
+def test_migration_skips_excluded_ids(db, catalog, customer):
+    booking = _legacy(db, catalog, customer, datetime(2024, 11, 18, 7, 0))
+
+    fixed, _ = migrate_legacy_dates(datetime.now(UTC) + timedelta(minutes=1), exclude=[str(booking)])
+
+    assert fixed == 0
+    assert "legacy_date_fixed" not in db.appointments.find_one({"_id": ObjectId(booking)})
@@ -0,0 +1,46 @@
+import pytest
+
+from app import create_app
+from app import user_routes
+from app.rate_limit import TokenBucketLimiter
+
+
+@pytest.fixture(autouse=True)
+def limiters(monkeypatch):
+    # Buckets novos a cada teste (os limitadores são globais do processo)
+    monkeypatch.setattr(user_routes, "login_ip_limiter", TokenBucketLimiter.from_rate("2/60"))
+    monkeypatch.setattr(user_routes, "login_email_limiter", TokenBucketLimiter.from_rate("100/60"))
+
+
+@pytest.mark.parametrize("body", [
+    {"email": 12345, "password": "x"},
+    {"email": ["a@example.com"], "password": "x"},
+    {"email": "a@example.com", "password": 12345},
+    ["a@example.com", "x"],
+])
+def test_login_rejects_malformed_credentials(client, body):
+    response = client.post('/user/login', json=body)
+
+    assert response.status_code == 400
+
+
+def _attempts(client, forwarded_for):
+    return [
+        client.post('/user/login', json={"email": "x@example.com", "password": "wrong"},
+                    headers={"X-Forwarded-For": forwarded_for}).status_code
+        for _ in range(3)
+    ]
+
+
+def test_ip_limit_uses_the_forwarded_client_behind_a_proxy(db):
+    app = create_app({'JWT_SECRET_KEY': 'test', 'MONGO_DB': db, 'TESTING': True, 'TRUSTED_PROXY_HOPS': 1})
+    client = app.test_client()
+
+    assert _attempts(client, "203.0.113.1") == [401, 401, 429]
+    # Outro cliente atrás do mesmo proxy não herda o bloqueio
+    assert _attempts(client, "203.0.113.2") == [401, 401, 429]
+
+
+def test_forwarded_header_is_ignored_without_trusted_proxies(client):
+    assert _attempts(client, "203.0.113.1") == [401, 401, 429]
+    assert _attempts(client, "203.0.113.2") == [429, 429, 429]
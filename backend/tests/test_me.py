@@ -0,0 +1,18 @@
+def test_barber_cannot_list_barbers_through_me(client, auth, catalog):
+    barber = auth(catalog["barbers"][0]["_id"], "barber")
+
+    assert client.get('/user/barbers', headers=barber).status_code == 403
+    assert client.get('/user/me?fields=barbers', headers=barber).status_code == 403
+
+    # Sem `fields`, o diretório fica de fora em vez de recusar a chamada inteira
+    response = client.get('/user/me', headers=barber)
+    assert response.status_code == 200
+    assert "barbers" not in response.json
+    assert response.json["role"] == "barber"
+
+
+def test_customer_gets_barbers_through_me(client, auth, catalog, customer):
+    response = client.get('/user/me?fields=barbers,role', headers=auth(customer, "user"))
+
+    assert response.status_code == 200
+    assert len(response.json["barbers"]) == len(catalog["barbers"])
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from app import rollups
+from app.dates import UTC
+from app.indexes import ensure_indexes
+from app.jobs import run_pending
+from app.rollups import COUNTERS, rebuild_rollups, record_event
+
+
+def _rollups(db):
+    # Só os contadores (ausentes valem 0), na ordem (dia, tipo, ref)
+    return sorted(
+        (
+            {"day": row["day"], "kind": row["kind"], "ref": row["ref"],
+             **{counter: row.get(counter, 0) for counter in COUNTERS}}
+            for row in db.daily_rollups.find()
+        ),
+        key=lambda row: (row["day"], row["kind"], str(row["ref"])),
+    )
+
+
+def test_imported_rollups_match_rebuild(client, db, auth, catalog, customer, admin):
+    barber = str(catalog["barbers"][0]["_id"])
+    service = str(catalog["services"][0]["_id"])
+    rows = [
+        {"user_id": str(customer), "barber_id": barber, "service_id": service,
+         "date": f"2030-01-02 {time}", "status": status}
+        for time, status in (("10:00:00", "scheduled"), ("11:00:00", "completed"), ("12:00:00", "cancelled"))
+    ]
+
+    response = client.post('/appointments/import', json={"appointments": rows}, headers=auth(admin, "admin"))
+    assert response.status_code == 201
+    assert response.json["inserted"] == 3
+    run_pending()
+
+    incremental = _rollups(db)
+    rebuild_rollups()
+    assert incremental == _rollups(db)
+    assert {row["booked_count"] for row in incremental} == {2}
+
+
+def test_retry_after_crash_applies_counters_once(monkeypatch, db, catalog, customer):
+    ensure_indexes(db)
+    appointment_id = db.appointments.insert_one({
+        "user_id": customer,
+        "barber_id": catalog["barbers"][0]["_id"],
+        "service_id": catalog["services"][0]["_id"],
+        "date": datetime(2030, 1, 2, 13, 0, tzinfo=UTC),
+        "status": "scheduled",
+    }).inserted_id
+
+    # Falha logo depois dos $inc, antes de marcar o agendamento como aplicado
+    apply = rollups._apply
+
+    def crash(entries, token):
+        apply(entries, token)
+        raise RuntimeError("worker morreu")
+    monkeypatch.setattr(rollups, "_apply", crash)
+    with pytest.raises(RuntimeError):
+        record_event("booked", [appointment_id], "job-1")
+    monkeypatch.setattr(rollups, "_apply", apply)
+
+    assert record_event("booked", [appointment_id], "job-1") == 1
+    assert record_event("booked", [appointment_id], "job-1") == 0
+
+    assert all(row["pending_jobs"] == [] for row in db.daily_rollups.find())
+    incremental = _rollups(db)
+    assert {row["booked_count"] for row in incremental} == {1}
+    rebuild_rollups()
+    assert incremental == _rollups(db)
@@ -1,7 +1,10 @@
 import React, { useState, useEffect } from 'react';
-import { getUserAppointments } from '../services/api'; // Função para buscar os agendamentos do backend
+import { getAllUserAppointments, localDay } from '../services/api'; // Função para buscar os agendamentos do backend
 import './AppointmentList.css'
 
+// Histórico exibido: agendamentos a partir de HISTORY_DAYS dias atrás (e todos os futuros)
+const HISTORY_DAYS = 90;
+
 const AppointmentList = () => {
   const [appointments, setAppointments] = useState([]);
   const [error, setError] = useState(null);
@@ -17,7 +20,7 @@ const AppointmentList = () => {
   
     try {
       // Verifica se a URL está sendo formada corretamente
-      const response = await getUserAppointments(token, userID); // Passa userID para a requisição corretamente
+      const response = await getAllUserAppointments(token, userID, { from: localDay(-HISTORY_DAYS), limit: 500 });
       if (response.error) {
         setError(response.error);
       } else {
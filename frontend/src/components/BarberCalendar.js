@@ -2,6 +2,17 @@ import React, { useState } from 'react';
 import DatePicker from 'react-datepicker';
 import "react-datepicker/dist/react-datepicker.css";
 
+// Expediente (BUSINESS_HOURS_START/END do backend): o último horário é o que ainda termina até o fechamento
+const OPENING_HOUR = 9;
+const LAST_START_HOUR = 17;
+const LAST_START_MINUTE = 30;
+
+const atTime = (hours, minutes) => {
+  const date = new Date();
+  date.setHours(hours, minutes, 0, 0);
+  return date;
+};
+
 const BarberCalendar = ({ bookedTimes, setSelectedDate }) => {
   // Inicializar selectedDate com null para não ter nenhum dia marcado
   const [selectedDate, setLocalSelectedDate] = useState(null);
@@ -27,6 +38,8 @@ const BarberCalendar = ({ bookedTimes, setSelectedDate }) => {
         onChange={handleDateChange}  // Atualiza a data selecionada
         showTimeSelect
         timeIntervals={30} // Intervalo de 30 minutos
+        minTime={atTime(OPENING_HOUR, 0)}
+        maxTime={atTime(LAST_START_HOUR, LAST_START_MINUTE)}
         dateFormat="Pp"
         minDate={new Date()} // Não permitir datas no passado
         filterDate={(date) => {
@@ -1,35 +1,73 @@
 import React, { useState, useEffect } from 'react';
-import { getBarbers } from '../services/api';
+import { getMe, searchBarbers } from '../services/api';
 import { useNavigate } from 'react-router-dom'; // Para navegação
 import './BarberList.css'
 
+const PAGE_SIZE = 20;
+const SEARCH_DELAY_MS = 300; // Espera o usuário parar de digitar antes de buscar
+
 const BarberList = () => {
   const [barbers, setBarbers] = useState([]);
+  const [services, setServices] = useState([]);
+  const [query, setQuery] = useState('');
+  const [serviceId, setServiceId] = useState('');
+  const [date, setDate] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
   const [error, setError] = useState(null);
   const token = localStorage.getItem('token');
   const navigate = useNavigate(); // Hook para navegação
 
+  // Serviços para o filtro
   useEffect(() => {
-    const fetchBarbers = async () => {
-      if (!token) {
-        setError('Token não encontrado. Faça login novamente.');
-        return;
-      }
+    if (!token) return;
+    getMe(token, ['services']).then((data) => setServices(data.services || []));
+  }, [token]);
+
+  useEffect(() => {
+    if (!token) {
+      setError('Token não encontrado. Faça login novamente.');
+      return;
+    }
 
+    const timer = setTimeout(async () => {
       try {
-        const data = await getBarbers(token);
+        const data = await searchBarbers(token, {
+          q: query || undefined,
+          service_id: serviceId || undefined,
+          date: date || undefined,
+          limit: PAGE_SIZE,
+        });
         if (data.error) {
           setError(data.error);
         } else {
+          setError(null);
           setBarbers(data.barbers || []);
+          setNextCursor(data.next_cursor);
         }
       } catch (error) {
         setError('Erro ao carregar barbeiros. Tente novamente mais tarde.');
       }
-    };
+    }, SEARCH_DELAY_MS);
 
-    fetchBarbers();
-  }, [token]);
+    return () => clearTimeout(timer);
+  }, [token, query, serviceId, date]);
+
+  // Próxima página com os mesmos filtros
+  const loadMore = async () => {
+    const data = await searchBarbers(token, {
+      q: query || undefined,
+      service_id: serviceId || undefined,
+      date: date || undefined,
+      limit: PAGE_SIZE,
+      after: nextCursor,
+    });
+    if (data.error) {
+      setError(data.error);
+    } else {
+      setBarbers((current) => [...current, ...(data.barbers || [])]);
+      setNextCursor(data.next_cursor);
+    }
+  };
 
   // Função para lidar com a seleção do barbeiro
   const handleBarberClick = (barberId, barberFullname) => {
@@ -40,6 +78,21 @@ const BarberList = () => {
   return (
     <div className="barber-list-container">
       <h3>Barbeiros Disponíveis</h3>
+      <div className="barber-filters">
+        <input
+          type="text"
+          placeholder="Buscar pelo nome"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+        />
+        <select value={serviceId} onChange={(e) => setServiceId(e.target.value)}>
+          <option value="">Todos os serviços</option>
+          {services.map((service) => (
+            <option key={service._id} value={service._id}>{service.name}</option>
+          ))}
+        </select>
+        <input type="date" value={date} onChange={(e) => setDate(e.target.value)} />
+      </div>
       {error ? (
         <div className="error-message">{error}</div>
       ) : (
@@ -51,10 +104,16 @@ const BarberList = () => {
               className="barber-item"
             >
               {barber.fullname}
+              {barber.next_free_slot && (
+                <span className="barber-next-slot">Livre a partir de {barber.next_free_slot.slice(11, 16)}</span>
+              )}
             </li>
           ))}
         </ul>
       )}
+      {!error && nextCursor && (
+        <button className="load-more-btn" onClick={loadMore}>Carregar mais</button>
+      )}
     </div>
   );
 };
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
-import { getUserRoles, getUserPoints } from '../services/api';
+import { getMe, logout } from '../services/api';
 import './Navbar.css';
 
 const Navbar = () => {
@@ -15,14 +15,12 @@ const Navbar = () => {
     const fetchUserData = async () => {
       if (token) {
         try {
-          const roleResponse = await getUserRoles(token);
-          const userRole = roleResponse.role;
+          // Role e pontos na mesma requisição
+          const me = await getMe(token, ['role', 'points']);
+          const userRole = me.role;
           setRole(userRole);
           localStorage.setItem('role', userRole);
-
-          const pointsResponse = await getUserPoints(token);
-          const userPoints = pointsResponse.points;
-          setPoints(userPoints);
+          setPoints(me.points);
 
           if (userRole === 'barber') {
             navigate(`/barberPage`);
@@ -40,7 +38,8 @@ const Navbar = () => {
     fetchUserData();
   }, [token, userID, navigate]);
 
-  const handleLogout = () => {
+  const handleLogout = async () => {
+    await logout(token);  // Revoga o token no servidor antes de limpar a sessão local
     localStorage.removeItem('token');
     localStorage.removeItem('user_id');
     localStorage.removeItem('role');
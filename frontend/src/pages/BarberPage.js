@@ -1,9 +1,25 @@
 import React, { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
-import { getBarberAppointments } from '../services/api';  // Função para pegar agendamentos do barbeiro
+import { getAllBarberAppointments, subscribeBarberAppointments } from '../services/api';  // Funções para pegar agendamentos do barbeiro
 import AppointmentDetails from '../components/AppointmentDetails';  // Componente que exibe os detalhes dos agendamentos
 import './BarberPage.css'
 
+// Formata a data como "YYYY-MM-DD" para os filtros from/to da API
+const formatDay = (date) => date.toISOString().slice(0, 10);
+
+// Sem stream (servidor sem suporte a SSE): recarrega a semana periodicamente
+const POLL_INTERVAL_MS = 30000;
+
+// Intervalo [domingo, próximo domingo) da semana atual
+const currentWeek = () => {
+  const start = new Date();
+  start.setHours(0, 0, 0, 0);
+  start.setDate(start.getDate() - start.getDay());
+  const end = new Date(start);
+  end.setDate(end.getDate() + 7);
+  return { from: formatDay(start), to: formatDay(end) };
+};
+
 const BarberPage = () => {
   const { barberId } = useParams();
   const [appointments, setAppointments] = useState([]);
@@ -11,13 +27,49 @@ const BarberPage = () => {
   const userId = localStorage.getItem('user_id'); // Obtendo o user_id do localStorage
 
   useEffect(() => {
+    const week = currentWeek();
+
     const fetchAppointments = async () => {
-      const data = await getBarberAppointments(token, userId);  // Chamada da API para agendamentos
+      // Busca apenas a semana visível, em vez de todo o histórico
+      const data = await getAllBarberAppointments(token, userId, week);
       console.log('Fetched appointments:', data);  // Log para depuração
       setAppointments(data.appointments || []);  // Armazenando os agendamentos
     };
 
     fetchAppointments();
+
+    // Recebe só as mudanças da agenda em vez de buscar tudo de novo
+    const source = subscribeBarberAppointments(token, userId, (type, appointment) => {
+      if (type === 'resync') {
+        fetchAppointments();
+        return;
+      }
+      const day = appointment.date.slice(0, 10);
+      if (day < week.from || day >= week.to) return;  // Fora da semana visível
+
+      setAppointments((current) => {
+        const others = current.filter((a) => a._id !== appointment._id);
+        return [...others, appointment].sort((a, b) => a.date.localeCompare(b.date));
+      });
+    });
+    // Ao reconectar, eventos podem ter sido perdidos: recarrega (resposta 304 se nada mudou)
+    let opened = false;
+    source.onopen = () => {
+      if (opened) fetchAppointments();
+      opened = true;
+    };
+    // Resposta de erro (ex.: 503 sem SSE): o navegador desiste do stream; passa a consultar
+    let poller = null;
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && !poller) {
+        poller = setInterval(fetchAppointments, POLL_INTERVAL_MS);
+      }
+    };
+
+    return () => {
+      source.close();
+      if (poller) clearInterval(poller);
+    };
   }, [barberId, userId, token]);  // Dependências para atualizar a lista de agendamentos
 
   return (
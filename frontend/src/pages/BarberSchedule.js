@@ -1,7 +1,7 @@
 // BarberSchedule.js
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate, useLocation } from 'react-router-dom';
-import { getBarberAppointments, getServices, createAppointment, getUserPoints, redeemFreeServiceChoice } from '../services/api';
+import { getAllBarberAppointments, getMe, localDay, createAppointment, redeemFreeServiceChoice } from '../services/api';
 import BarberCalendar from '../components/BarberCalendar'; // Importando o novo componente
 import './BarberSchedule.css';
 
@@ -29,7 +29,8 @@ const BarberSchedule = () => {
       }
     
       try {
-        const data = await getBarberAppointments(token, barberId);
+        // Só interessam os horários a partir de hoje (o calendário não aceita datas passadas)
+        const data = await getAllBarberAppointments(token, barberId, { from: localDay(), limit: 500 });
        
         if (data.error) {
           setError(data.error);
@@ -42,37 +43,28 @@ const BarberSchedule = () => {
       }
     };
 
-    const fetchServices = async () => {
-      if (!token) return;
-      try {
-        const serviceData = await getServices(token);
-        setServices(serviceData.services || []);
-      } catch (error) {
-        setError('Erro ao carregar os serviços. Tente novamente mais tarde.');
-        console.error('Erro:', error);
-      }
-    };
-
-    const fetchUserPoints = async () => {
+    // Serviços e pontos do usuário em uma única chamada
+    const fetchServicesAndPoints = async () => {
       if (!token) return;
 
       try {
-        const data = await getUserPoints(token);
+        const data = await getMe(token, ['services', 'points']);
         if (data.error) {
-          console.log('Erro ao buscar pontos:', data.error);
+          setError('Erro ao carregar os serviços. Tente novamente mais tarde.');
+          console.log('Erro ao buscar serviços e pontos:', data.error);
         } else {
+          setServices(data.services || []);
           setPoints(data.points); // Atualiza o estado com os pontos
         }
       } catch (error) {
-        console.error('Erro ao buscar pontos do usuário:', error);
+        console.error('Erro ao buscar serviços e pontos do usuário:', error);
       } finally {
         setLoadingPoints(false);
       }
     };
 
     fetchAppointments();
-    fetchServices();
-    fetchUserPoints();
+    fetchServicesAndPoints();
   }, [barberId, token]);
 
   // Calcula os horários ocupados
@@ -117,9 +109,9 @@ const BarberSchedule = () => {
 
     if (isFreeService) {
       try {
-        const data = await redeemFreeServiceChoice(token, selectedService, barberId);
+        const data = await redeemFreeServiceChoice(token, selectedService, barberId, formattedDate);
         if (data.error) {
-          setError('Erro ao resgatar o serviço gratuito.');
+          setError(data.error || 'Erro ao resgatar o serviço gratuito.');
         } else {
           alert('Serviço gratuito resgatado com sucesso!');
           setSelectedDate(null);
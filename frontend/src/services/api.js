@@ -73,6 +73,11 @@ export const login = (email, password) => {
   return postRequest('/user/login', { email, password });
 };
 
+// Função para encerrar a sessão (revoga o token no servidor)
+export const logout = (token) => {
+  return postRequest('/user/logout', {}, token);
+};
+
 // Função para registrar um usuário
 export const register = (email, password, fullname, role) => {
   return postRequest('/user/register', { email, password, fullname, role});
@@ -113,14 +118,77 @@ export const getUserRoles = (token) => {
   return getRequest(`/user/check_role`, token);
 };
 
-export const getBarberAppointments = (token, barberId) => {
-  return getRequest(`/user/appointments/barber/${barberId}`, token);
+// Monta a query string de paginação/filtro (limit, after, from, to)
+const buildQuery = (params = {}) => {
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, value]) => value !== undefined && value !== null)
+  ).toString();
+  return query ? `?${query}` : '';
+};
+
+// Busca paginada de barbeiros (q, service_id, date, limit, after)
+export const searchBarbers = (token, params) => {
+  return getRequest(`/user/barbers/search${buildQuery(params)}`, token);
+};
+
+// Dia local "YYYY-MM-DD" (para os filtros from/to), deslocado em `offsetDays`
+export const localDay = (offsetDays = 0) => {
+  const date = new Date();
+  date.setDate(date.getDate() + offsetDays);
+  const pad = (n) => String(n).padStart(2, '0');
+  return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())}`;
+};
+
+// Listagens são paginadas (ordem crescente de data): segue o next_cursor até a última página
+const fetchAllPages = async (fetchPage, params) => {
+  const appointments = [];
+  let after;
+  do {
+    const data = await fetchPage({ ...params, after });
+    if (data.error) return data;
+    appointments.push(...(data.appointments || []));
+    after = data.next_cursor;
+  } while (after);
+  return { appointments };
+};
+
+export const getBarberAppointments = (token, barberId, params) => {
+  return getRequest(`/user/appointments/barber/${barberId}${buildQuery(params)}`, token);
 };
 
-export const getUserAppointments = (token, userID) => {
-  return getRequest(`/user/appointments/user/${userID}`, token);
+// Abre o stream SSE com as mudanças da agenda do barbeiro (created/completed/cancelled).
+// O EventSource não envia cabeçalhos, por isso o token vai na query string.
+export const subscribeBarberAppointments = (token, barberId, onEvent) => {
+  const source = new EventSource(`${API_URL}/appointments/stream/${barberId}?jwt=${encodeURIComponent(token)}`);
+  ['created', 'completed', 'cancelled', 'resync'].forEach((type) => {
+    source.addEventListener(type, (event) => onEvent(type, event.data ? JSON.parse(event.data) : null));
+  });
+  return source;
+};
+
+export const getUserAppointments = (token, userID, params) => {
+  return getRequest(`/user/appointments/user/${userID}${buildQuery(params)}`, token);
 }
 
+// Todas as páginas de um intervalo (ex.: { from: localDay() } para a agenda a partir de hoje)
+export const getAllBarberAppointments = (token, barberId, params) => {
+  return fetchAllPages((page) => getBarberAppointments(token, barberId, page), params);
+};
+
+export const getAllUserAppointments = (token, userID, params) => {
+  return fetchAllPages((page) => getUserAppointments(token, userID, page), params);
+};
+
+// Função para buscar os horários livres de um barbeiro em um dia (YYYY-MM-DD)
+export const getAvailability = (token, barberId, date, serviceId) => {
+  return getRequest(`/appointments/availability${buildQuery({ barber_id: barberId, date, service_id: serviceId })}`, token);
+};
+
+// Dados iniciais da tela em uma única chamada (role, fullname, points, appointments, barbers, services)
+export const getMe = (token, fields) => {
+  return getRequest(`/user/me${buildQuery({ fields: fields ? fields.join(',') : undefined })}`, token);
+};
+
 // Função para pegar os pontos do usuário
 export const getUserPoints = (token) => {
   return getRequest('/user/points', token);
@@ -132,11 +200,11 @@ export const redeemFreeService = (token) => {
 };
 
 // Função para resgatar um serviço gratuito específico
-export const redeemFreeServiceChoice = (token, serviceId, barberID) => {
-  // Agora estamos enviando o barberID no corpo da requisição
+export const redeemFreeServiceChoice = (token, serviceId, barberID, date) => {
+  // Agora estamos enviando o barberID (e o horário escolhido) no corpo da requisição
   return postRequest(
     `/user/redeem_free_service/${serviceId}`, 
-    { barber_id: barberID },  // Barber ID adicionado no corpo
+    { barber_id: barberID, date },  // Sem date, o servidor usa o próximo horário da grade
     token
   );
 };